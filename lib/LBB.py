@@ -1,3 +1,5 @@
+import functools
+
 import numpy as np
 import qutip as qt
 
@@ -5,6 +7,10 @@ import lib.NQobj as nq
 import lib.PBB as pbb
 import lib.quantum_optical_modelling as qom
 import lib.states as st
+from lib.operator_bank import banked
+
+# Names of modes that are treated as spins, all other modes are photonic modes.
+SPIN_NAMES = ["Spin", "spin", "Alice", "Bob", "Charlie", "alice", "bob", "charlie"]
 
 # Covenience function for tracing out
 
@@ -25,8 +31,7 @@ def trace_out_loss_modes(Q):
         Quantum object after tracing out the loss modes.
     """
 
-    loss_modes = [x for x in Q.names[0] if "loss" in x]
-    return Q.ptrace(loss_modes, keep=False)
+    return nq.partial_trace(Q, [x for x in Q.names[0] if "loss" not in x])
 
 
 def trace_out_everything_but_spins(Q):
@@ -45,9 +50,8 @@ def trace_out_everything_but_spins(Q):
         Quantum object after tracing out all modes except spins.
     """
 
-    classic_spin_names = ["Spin", "spin", "Alice", "Bob", "Charlie", "alice", "bob", "charlie"]
-    spin_modes = [x for x in Q.names[0] if x in classic_spin_names]
-    return Q.ptrace(spin_modes)
+    spin_modes = [x for x in Q.names[0] if x in SPIN_NAMES]
+    return nq.partial_trace(Q, spin_modes)
 
 
 ####################################
@@ -117,7 +121,7 @@ def spontaneous_emission_fock_spi(
 
     # Compute the output density matrix using the defined channels
     c = np.sqrt(p_coh) * c_coh + np.sqrt(p_loss) * c_loss
-    dm_out = c * dm_in * c.dag() + p_incoh * c_incoh * dm_in * c_incoh.dag() + p_2ph * c_2ph * dm_in * c_2ph.dag()
+    dm_out = dm_in.apply_channel([c, c_incoh, c_2ph], weights=[1, p_incoh, p_2ph])
 
     return trace_out_loss_modes(dm_out)
 
@@ -183,66 +187,97 @@ def conditional_amplitude_reflection_time_bin_spi(
     returns the processed output density matrix.
     """
 
-    # If ideal, directly set reflection and transmission probabilities
-    if ideal:
-        t_u = r_d = 1
-        t_d = r_u = 0
-        l_u = l_d = 0
-
     # If not ideal, check if all required parameters are provided
-    else:
-        if None in (f_operation, kappa_r, kappa_t, gamma, delta, splitting, g):
-            raise ValueError(
-                "In not ideal then f_operation, kappa_r, kappa_t, gamma, delta, splitting, g should all be defined."
-            )
-
-        C = 4 * g**2 / (kappa_t + kappa_r + kappa_loss) / (gamma + gamma_dephasing)
-
-        # Calculate the conditional amplitude reflection based on centeredness and provided parameters
-        if atom_centered:
-            t_u, r_u, l_u = qom.cavity_qom_atom_centered(
-                f_operation, -delta, kappa_r, kappa_t, kappa_loss, gamma, C, gamma_dephasing=gamma_dephasing
-            )
-            t_d, r_d, l_d = qom.cavity_qom_atom_centered(
-                f_operation + splitting / 2,
-                -delta - splitting / 2,
-                kappa_r,
-                kappa_t,
-                kappa_loss,
-                gamma,
-                C,
-                gamma_dephasing=gamma_dephasing,
-            )
-
-        else:
-            t_u, r_u, l_u = qom.cavity_qom_cavity_centered(
-                f_operation, delta, kappa_r, kappa_t, kappa_loss, gamma, C, gamma_dephasing=gamma_dephasing
-            )
-            t_d, r_d, l_d = qom.cavity_qom_cavity_centered(
-                f_operation, delta - splitting, kappa_r, kappa_t, kappa_loss, gamma, C, gamma_dephasing=gamma_dephasing
-            )
-
-    # Implement the conditional amplitude reflection operation with the physical building block (PBB)
-    cav = pbb.conditional_amplitude_reflection(r_u, t_u, l_u, r_d, t_d, l_d, dim=dim)
-    cav.rename("spin", spin_name)
+    if not ideal and None in (f_operation, kappa_r, kappa_t, gamma, delta, splitting, g):
+        raise ValueError(
+            "In not ideal then f_operation, kappa_r, kappa_t, gamma, delta, splitting, g should all be defined."
+        )
+
+    # The coefficients and the operator are memoized, such that nodes with the same cQED parameters share them.
+    coefficients = _cavity_coefficients(
+        ideal, atom_centered, f_operation, kappa_r, kappa_t, kappa_loss, gamma, delta, splitting, g, gamma_dephasing
+    )
+    cav_generic = _conditional_amplitude_reflection_operator(*coefficients, dim=dim)
 
     # The early reflection process and obtain the resulting density matrix
-    cav.rename("R", photon_early_name)
-    cav.rename("T", "loss_transmission")
-    cav.rename("loss", "loss")
+    cav = _rename_modes(
+        cav_generic, {"spin": spin_name, "R": photon_early_name, "T": "loss_transmission", "loss": "loss"}
+    )
 
-    dm_E_full = cav * dm_in * cav.dag()
+    dm_E_full = dm_in.conjugate_by(cav)
     dm_E = trace_out_loss_modes(dm_E_full)
 
     # Flip the spin state and the late reflection process
     RX_pi = nq.NQobj([[0, 1], [1, 0]], names=spin_name, kind="oper")
-    cav.rename(photon_early_name, photon_late_name)
-    dm_L_full = cav * (RX_pi * dm_E * RX_pi.dag()) * cav.dag()
+    cav = _rename_modes(cav, {photon_early_name: photon_late_name})
+    dm_L_full = dm_E.conjugate_by(RX_pi).conjugate_by(cav)
     dm_L = trace_out_loss_modes(dm_L_full)
 
     return dm_L
 
 
+@functools.lru_cache(maxsize=32)
+def _cavity_coefficients(
+    ideal, atom_centered, f_operation, kappa_r, kappa_t, kappa_loss, gamma, delta, splitting, g, gamma_dephasing
+):
+    """
+    Reflection, transmission and loss coefficients (r_u, t_u, l_u, r_d, t_d, l_d) of a cQED system.
+    """
+    # If ideal, directly set reflection and transmission probabilities
+    if ideal:
+        t_u = r_d = 1
+        t_d = r_u = 0
+        l_u = l_d = 0
+        return r_u, t_u, l_u, r_d, t_d, l_d
+
+    C = 4 * g**2 / (kappa_t + kappa_r + kappa_loss) / (gamma + gamma_dephasing)
+
+    # Calculate the conditional amplitude reflection based on centeredness and provided parameters
+    if atom_centered:
+        t_u, r_u, l_u = qom.cavity_qom_atom_centered(
+            f_operation, -delta, kappa_r, kappa_t, kappa_loss, gamma, C, gamma_dephasing=gamma_dephasing
+        )
+        t_d, r_d, l_d = qom.cavity_qom_atom_centered(
+            f_operation + splitting / 2,
+            -delta - splitting / 2,
+            kappa_r,
+            kappa_t,
+            kappa_loss,
+            gamma,
+            C,
+            gamma_dephasing=gamma_dephasing,
+        )
+
+    else:
+        t_u, r_u, l_u = qom.cavity_qom_cavity_centered(
+            f_operation, delta, kappa_r, kappa_t, kappa_loss, gamma, C, gamma_dephasing=gamma_dephasing
+        )
+        t_d, r_d, l_d = qom.cavity_qom_cavity_centered(
+            f_operation, delta - splitting, kappa_r, kappa_t, kappa_loss, gamma, C, gamma_dephasing=gamma_dephasing
+        )
+    return r_u, t_u, l_u, r_d, t_d, l_d
+
+
+@banked
+def _conditional_amplitude_reflection_operator(r_u, t_u, l_u, r_d, t_d, l_d, dim):
+    """
+    Memoized pbb.conditional_amplitude_reflection, with the modes spin, R, T and loss.
+    The returned operator is shared and should not be modified in place, use _rename_modes for other names.
+    """
+    return pbb.conditional_amplitude_reflection(r_u, t_u, l_u, r_d, t_d, l_d, dim=dim)
+
+
+def _rename_modes(Q, mapping):
+    """
+    Copy of Q with the modes renamed according to mapping, which shares the data of Q.
+    Like NQobj.rename, a new name can not be a name that is already used.
+    """
+    names = [[mapping.get(name, name) for name in names] for names in Q.names]
+    if any(len(set(axis_names)) != len(axis_names) for axis_names in names):
+        raise ValueError("You cannot use a new_name which is already used.")
+    return nq.NQobj._trusted(Q, names, Q.kind)
+
+
 ###########################
 ##  Photonic operations  ##
 ###########################
@@ -274,7 +309,7 @@ def hom(dm_in, photon_names, dim, **kw):
     # Rename the second output mode of the beamsplitter with the second photon name provided
     hom_bs.rename("B", photon_names[1])
 
-    return hom_bs * dm_in * hom_bs.dag()
+    return dm_in.conjugate_by(hom_bs)
 
 
 def basis_rotation(dm_in, photon_names, dim, sign=+1, **kw):
@@ -303,7 +338,7 @@ def basis_rotation(dm_in, photon_names, dim, sign=+1, **kw):
     wp.rename("A", photon_names[0])
     wp.rename("B", photon_names[1])
 
-    return wp * dm_in * wp.dag()
+    return dm_in.conjugate_by(wp)
 
 
 def mode_loss(dm_in, photon_name, loss, dim, ideal=False, **kw):
@@ -336,8 +371,8 @@ def mode_loss(dm_in, photon_name, loss, dim, ideal=False, **kw):
     link_loss = pbb.loss(loss, dim=dim)
     link_loss.rename("A", photon_name)
 
-    dm_loss = link_loss * dm_in * link_loss.dag()
-    dm_out = dm_loss.ptrace(["loss"], keep=False)
+    dm_loss = dm_in.conjugate_by(link_loss)
+    dm_out = nq.partial_trace(dm_loss, [name for name in dm_loss.names[0] if name != "loss"])
 
     return dm_out
 
@@ -409,7 +444,7 @@ def spin_pi_x(dm_in, spin_name, **kw):
 
     # Define the pi rotation operator about x-axis
     RX_pi = nq.name(qt.sigmax(), names=spin_name)
-    return RX_pi * dm_in * RX_pi.dag()
+    return dm_in.conjugate_by(RX_pi)
 
 
 def spin_pi_y(dm_in, spin_name, **kw):
@@ -431,7 +466,7 @@ def spin_pi_y(dm_in, spin_name, **kw):
 
     # Define the pi rotation operator about y-axis
     RY_pi = nq.name(qt.sigmay(), names=spin_name)
-    return RY_pi * dm_in * RY_pi.dag()
+    return dm_in.conjugate_by(RY_pi)
 
 
 ########################
@@ -457,7 +492,7 @@ def herald(dm_in, herald_projector, **kw):
     """
 
     # Apply the heralding to the density matrix
-    dm_final = herald_projector * dm_in * herald_projector.dag()
+    dm_final = dm_in.conjugate_by(herald_projector)
     return trace_out_everything_but_spins(dm_final)
 
 
@@ -495,4 +530,4 @@ def dark_counts(dm_in, photon_name, dc_rate, dim, ideal=False, **kw):
     a = nq.name(qt.destroy(dim), photon_name)
 
     # Photon is added to the designated mode.
-    return (dc_rate) * (a.dag() * dm_in * a) + (1 - dc_rate) * dm_in
+    return (dc_rate) * dm_in.conjugate_by(a.dag()) + (1 - dc_rate) * dm_in
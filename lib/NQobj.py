@@ -1,11 +1,20 @@
+import json
 import numbers
+import sys
+import types
 from copy import deepcopy
 
 import numpy as np
 import qutip as qt
+import scipy.sparse as sp
 from qutip.cy.spconvert import arr_coo2fast, cy_index_permute
+from qutip.fastsparse import fast_csr_matrix
 from qutip.permute import _permute  # To support the _permute2 function
 
+# Results of NQobj operations are built through NQobj._trusted, which skips the validation of names and kind.
+# Set DEBUG_VALIDATION to True to validate every NQobj again, e.g. when debugging a new operation.
+DEBUG_VALIDATION = False
+
 
 class NQobj(qt.Qobj):
     """
@@ -118,10 +127,47 @@ class NQobj(qt.Qobj):
         else:
             raise ValueError('kind can only be "oper", "state", None')
 
+    @classmethod
+    def _trusted(cls, q, names, kind):
+        """
+        Construct an NQobj from a Qobj result that is correct by construction.
+
+        Unlike the constructor, the data of q is not copied and names and kind are not validated. This is meant for
+        the results of NQobj operations only; user-facing construction should go through the constructor.
+        When DEBUG_VALIDATION is True the constructor is used instead.
+
+        Parameters:
+        - q: Qobj holding the data and dims of the result. Its data is shared with the new NQobj.
+        - names: List of two lists of str with the names of the modes.
+        - kind: "oper" or "state".
+        """
+        if DEBUG_VALIDATION:
+            return cls(q, names=names, kind=kind)
+        out = cls.__new__(cls)
+        out._data = q.data
+        out.dims = q.dims
+        out._isherm = q._isherm
+        out._isunitary = q._isunitary
+        out._type = None
+        out.superrep = q.superrep
+        out.names = names
+        out.kind = kind
+        return out
+
+    def __reduce__(self):
+        """Pickle as a single buffer with the CSR arrays, dims, names and kind (see _pack)."""
+        return _unpack, (_pack(self),)
+
+    def __copy__(self):
+        return NQobj._trusted(self, [list(names) for names in self.names], self.kind)
+
+    def __deepcopy__(self, memo):
+        return _unpack(_pack(self))
+
     def copy(self):
         """Create an identical copy of the NQobj."""
         q = super().copy()
-        return NQobj(q, names=deepcopy(self.names), kind=self.kind)
+        return NQobj._trusted(q, deepcopy(self.names), self.kind)
 
     def __add__(self, other):
         """
@@ -149,7 +195,7 @@ class NQobj(qt.Qobj):
                     other = _adding_missing_modes(other, missing_dict_other, kind=other.kind)
                     other = other.permute(names)
                 Qobj_result = super(NQobj, self).__add__(other)
-                return NQobj(Qobj_result, names=names, kind=self.kind)
+                return NQobj._trusted(Qobj_result, names, self.kind)
             else:
                 raise NotImplementedError
         else:
@@ -197,11 +243,11 @@ class NQobj(qt.Qobj):
                 else:
                     kind = "state"
 
-                return NQobj(Qobj_result, names=names, kind=kind)
+                return NQobj._trusted(Qobj_result, names, kind)
 
         # Handle multiplication with a number
         elif isinstance(other, numbers.Number):
-            return NQobj(super().__mul__(other), names=self.names, kind=self.kind)
+            return NQobj._trusted(super().__mul__(other), self.names, self.kind)
 
         # Handle multiplication with a plain Qobj
         elif isinstance(other, qt.Qobj):
@@ -228,14 +274,14 @@ class NQobj(qt.Qobj):
         Division operation, intended for division by numbers only.
         Returns a new NQobj with the result of the division.
         """
-        return NQobj(super().__div__(other), names=self.names, kind=self.kind)
+        return NQobj._trusted(super().__div__(other), self.names, self.kind)
 
     def __neg__(self):
         """
         Negation operation.
         Returns a new NQobj with the negated values.
         """
-        return NQobj(super().__neg__(), names=self.names, kind=self.kind)
+        return NQobj._trusted(super().__neg__(), self.names, self.kind)
 
     def __eq__(self, other):
         """
@@ -251,7 +297,7 @@ class NQobj(qt.Qobj):
         Power operation for raising the NQobj to a certain power.
         Returns a new NQobj with the result.
         """
-        return NQobj(super().__pow__(n, m=m), names=self.names, kind=self.kind)
+        return NQobj._trusted(super().__pow__(n, m=m), self.names, self.kind)
 
     def __str__(self):
         """
@@ -278,21 +324,80 @@ class NQobj(qt.Qobj):
         """
         out = super().dag()
         names = [self.names[1], self.names[0]]
-        return NQobj(out, names=names, kind=self.kind)
+        return NQobj._trusted(out, names, self.kind)
+
+    def conjugate_by(self, op):
+        """
+        Returns op * self * op.dag().
+
+        The names of op and self are aligned once and the dagger of op is taken on the aligned data,
+        instead of building op.dag() as a separate NQobj and aligning the names for both products.
+        """
+        return self.apply_channel([op])
+
+    def apply_channel(self, kraus, weights=None):
+        """
+        Apply a channel in operator sum representation: sum_i weights[i] * K_i * self * K_i.dag().
+
+        All Kraus operators and self are aligned to one common order of names, after which the terms are
+        accumulated into a single output. Terms with a weight of zero are skipped, but their modes still
+        appear in the output, just as for the explicit sum of products.
+
+        Parameters:
+        - kraus: List of NQobj of kind "oper" (the Kraus operators K_i).
+        - weights: List of numbers with the weight of every term, default is 1 for every term.
+
+        Returns:
+        - A new NQobj with the output of the channel.
+        """
+        if weights is None:
+            weights = [1] * len(kraus)
+        if len(weights) != len(kraus):
+            raise ValueError("kraus and weights should have the same length.")
+
+        if not (_is_square_named(self) and all(K.kind == "oper" and _is_square_named(K) for K in kraus)):
+            # Fall back on the generic multiplication of NQobj.
+            out = None
+            for K, weight in zip(kraus, weights):
+                term = weight * (K * self * K.dag())
+                out = term if out is None else out + term
+            return out
+
+        # Find the common order of names and the dimension of every mode.
+        dims = dict(zip(self.names[0], self.dims[0]))
+        for K in kraus:
+            dims.update(zip(K.names[0], K.dims[0]))
+        order = list(dict.fromkeys(self.names[0] + [name for K in kraus for name in K.names[1] + K.names[0]]))
+
+        rho = _align_to_order(self, order, dims)
+        data = None
+        for K, weight in zip(kraus, weights):
+            if weight == 0:
+                continue
+            K_data = _align_to_order(K, order, dims).data
+            term = K_data * rho.data * K_data.adjoint()
+            if weight != 1:
+                term = weight * term
+            data = term if data is None else data + term
+
+        q = qt.Qobj()
+        q.dims = [[dims[name] for name in order]] * 2
+        q.data = data if data is not None else fast_csr_matrix(shape=rho.shape)
+        return NQobj._trusted(q, [order, list(order)], self.kind)
 
     def proj(self):
         """
         Form the projector from a given ket or bra vector of the NQobj.
         Returns a new NQobj that represents the projector.
         """
-        return NQobj(super().proj(), names=self.names, kind="oper")
+        return NQobj._trusted(super().proj(), self.names, "oper")
 
     def unit(self, *args, **kwargs):
         """
         Normalize the NQobj to unity, either as an operator or state.
         Returns a new NQobj that is normalized.
         """
-        return NQobj(super().unit(*args, **kwargs), names=self.names, kind=self.kind)
+        return NQobj._trusted(super().unit(*args, **kwargs), self.names, self.kind)
 
     def ptrace(self, sel, keep=True):
         if self.dims[0] != self.dims[1]:
@@ -317,7 +422,9 @@ class NQobj(qt.Qobj):
 
         names = [name for i, name in enumerate(self.names[0]) if i in sel]
 
-        return NQobj(super().ptrace(sel), names=[names, names], kind=self.kind)
+        if self.isoper and names and _same_modes(self):
+            return partial_trace(self, names)
+        return NQobj._trusted(super().ptrace(sel), [names, names], self.kind)
 
     def permute(self, order):
         if isinstance(order, list) and all(isinstance(i, str) for i in order):
@@ -351,7 +458,7 @@ class NQobj(qt.Qobj):
         names_0 = [self.names[0][i] for i in order[0]]
         names_1 = [self.names[1][i] for i in order[1]]
         names = [names_0, names_1]
-        return NQobj(q, names=names, kind=self.kind)
+        return NQobj._trusted(q, names, self.kind)
 
     def rename(self, name, new_name):
         """Rename a mode called name to new_name."""
@@ -384,16 +491,12 @@ class NQobj(qt.Qobj):
 
     def expm(self):
         if self.names[0] == self.names[1] and self.dims[0] == self.dims[1]:
-            return NQobj(super().expm(), names=self.names, kind=self.kind)
+            return NQobj._trusted(super().expm(), self.names, self.kind)
         else:
             new_self = self.expand()
             new_self.permute([new_self.names[0], new_self.names[0]])
             if new_self.names[0] == new_self.names[1] and new_self.dims[0] == new_self.dims[1]:
-                return NQobj(
-                    super(NQobj, new_self).expm(),
-                    names=new_self.names,
-                    kind=new_self.kind,
-                )
+                return NQobj._trusted(super(NQobj, new_self).expm(), new_self.names, new_self.kind)
             else:
                 raise ValueError("For exponentiation the matrix should have square submatrixes.")
 
@@ -416,7 +519,7 @@ class NQobj(qt.Qobj):
         Returns:
         - A new NQobj which is the transpose of the current NQobj, with the names of bra and ket swapped.
         """
-        return NQobj(super().trans(), names=[self.names[1], self.names[0]], kind=self.kind)
+        return NQobj._trusted(super().trans(), [self.names[1], self.names[0]], self.kind)
 
     def expand(self):
         """
@@ -458,7 +561,7 @@ class NQobj(qt.Qobj):
                 self.dims[0].pop()
 
         # Return the expanded NQobj, permuted to have the required names in order
-        return NQobj(self, names=names, kind=kind).permute(required_names)
+        return NQobj._trusted(self, names, kind).permute(required_names)
 
 
 def tensor(*args):
@@ -475,8 +578,17 @@ def tensor(*args):
     return out
 
 
+def _tensor_trusted(*args):
+    """Tensor product of NQobj with the same kind and distinct names, without validation of the result."""
+    names = [[], []]
+    for arg in args:
+        names[0] += arg.names[0]
+        names[1] += arg.names[1]
+    return NQobj._trusted(qt.tensor(*args), names, args[0].kind)
+
+
 def ket2dm(Q):
-    return NQobj(qt.ket2dm(Q), names=Q.names, kind="state")
+    return NQobj._trusted(qt.ket2dm(Q), Q.names, "state")
 
 
 def name(Q, names, kind=None):
@@ -493,6 +605,198 @@ def fidelity(A, B):
     return qt.fidelity(A, B.permute(A.names))
 
 
+def partial_trace(Q, names):
+    """
+    Partial trace over all modes that are not in names, with the kept modes in the order of names.
+
+    This fuses the permutation and the partial trace in one pass over the nonzero elements: the elements that
+    are off-diagonal in a traced mode are dropped and the indices of the others are mapped directly to the
+    output order, such that no permuted or dense intermediate is built. The rows and columns of Q may have
+    their modes in different orders.
+
+    Parameters:
+    - Q: NQobj operator with the same modes and dimensions on both axes.
+    - names: List of names of the modes to keep, in the order of the output.
+
+    Returns:
+    - A new NQobj with names [names, names].
+    """
+    if not _same_modes(Q):
+        raise ValueError("partial_trace needs the same modes with the same dimensions on both axes.")
+    if not names or len(names) != len(set(names)) or set(names) - set(Q.names[0]):
+        raise ValueError("names should be a nonempty list of distinct names of Q.")
+
+    if Q.names[0] == names and Q.names[1] == names:
+        return NQobj._trusted(Q, [list(names), list(names)], Q.kind)
+
+    coo = Q.data.tocoo()
+    row = coo.row.astype(np.int64)
+    col = coo.col.astype(np.int64)
+    row_digits = _digits(Q.names[0], Q.dims[0])
+    col_digits = _digits(Q.names[1], Q.dims[1])
+
+    diagonal = None
+    for name in Q.names[0]:
+        if name not in names:
+            traced = row_digits(row, name) == col_digits(col, name)
+            diagonal = traced if diagonal is None else diagonal & traced
+    values = coo.data
+    if diagonal is not None:
+        row, col, values = row[diagonal], col[diagonal], values[diagonal]
+
+    dims = [Q.dims[0][Q.names[0].index(name)] for name in names]
+    new_row = np.zeros_like(row)
+    new_col = np.zeros_like(col)
+    for name, dim in zip(names, dims):
+        new_row = new_row * dim + row_digits(row, name)
+        new_col = new_col * dim + col_digits(col, name)
+
+    d = int(np.prod(dims))
+    # Elements that only differ in a traced mode end up at the same index, the conversion of scipy sums them.
+    csr = sp.csr_matrix((values, (new_row, new_col)), shape=(d, d))
+    csr.sort_indices()
+    q = qt.Qobj()
+    q.dims = [dims, list(dims)]
+    q.data = fast_csr_matrix((csr.data, csr.indices, csr.indptr), shape=(d, d))
+    q = q.tidyup() if qt.settings.auto_tidyup else q
+    return NQobj._trusted(q, [list(names), list(names)], Q.kind)
+
+
+def resize_mode(Q, name, dim):
+    """
+    Change the dimension of the mode called name on all axes where it appears.
+
+    Truncation drops the levels from dim upward, padding adds empty levels. Only the nonzero
+    elements are processed, so no intermediate in the full space is built.
+
+    Parameters:
+    - Q: NQobj
+    - name: Name of the mode to resize.
+    - dim: New dimension of the mode.
+
+    Returns:
+    - A new NQobj with the resized mode.
+    """
+    Qcoo = Q.data.tocoo()
+    keep = np.ones(Qcoo.nnz, dtype=bool)
+    indices = [Qcoo.row, Qcoo.col]
+    new_dims = deepcopy(Q.dims)
+    for axis in range(2):
+        if name not in Q.names[axis]:
+            continue
+        position = Q.names[axis].index(name)
+        new_dims[axis][position] = dim
+        multi_index = np.unravel_index(indices[axis], Q.dims[axis])
+        keep &= multi_index[position] < dim
+        indices[axis] = np.ravel_multi_index(
+            tuple(np.minimum(index, d - 1) for index, d in zip(multi_index, new_dims[axis])), new_dims[axis]
+        )
+
+    q = qt.Qobj()
+    q.dims = new_dims
+    q.data = arr_coo2fast(
+        Qcoo.data[keep],
+        indices[0][keep].astype(np.int32),
+        indices[1][keep].astype(np.int32),
+        int(np.prod(new_dims[0])),
+        int(np.prod(new_dims[1])),
+    )
+    return NQobj._trusted(q, deepcopy(Q.names), Q.kind)
+
+
+def sparsify(Q, threshold):
+    """
+    Drop the elements with an absolute value below threshold.
+
+    The trace norm of the dropped part is at most the sum of the absolute values of its elements, which is
+    returned as a bound of the error.
+
+    Parameters:
+    - Q: NQobj
+    - threshold: Elements with an absolute value strictly below threshold are dropped.
+
+    Returns:
+    - A new NQobj without the dropped elements, or Q itself if no element is dropped.
+    - The sum of the absolute values of the dropped elements.
+    """
+    csr = Q.data
+    values, indices, indptr = csr.data, csr.indices, csr.indptr
+    magnitudes = np.abs(values)
+    keep = magnitudes >= threshold
+    if keep.all():
+        return Q, 0.0
+    kept_before = np.concatenate([[0], np.cumsum(keep)]).astype(indptr.dtype)
+    arrays = [values[keep], indices[keep], kept_before[indptr]]
+    q = qt.Qobj()
+    q.dims = Q.dims
+    q.data = fast_csr_matrix(tuple(arrays), shape=Q.shape)
+    q._isherm = Q._isherm
+    return NQobj._trusted(q, deepcopy(Q.names), Q.kind), float(magnitudes[~keep].sum())
+
+
+def _pack(Q):
+    """
+    Pack an NQobj in one contiguous buffer: the length of a json header, the header with names, dims, kind and
+    shape, and the data, indices and indptr arrays of the CSR matrix, each aligned to 16 bytes.
+    """
+    csr = Q.data
+    arrays = [csr.data, csr.indices, csr.indptr]
+    header = {
+        "names": Q.names,
+        "dims": [[int(dim) for dim in dims] for dims in Q.dims],
+        "kind": Q.kind,
+        "shape": [int(size) for size in Q.shape],
+        "isherm": Q._isherm,
+        "isunitary": Q._isunitary,
+        "superrep": Q.superrep,
+        "arrays": [[array.dtype.str, len(array)] for array in arrays],
+    }
+    header = json.dumps(header).encode()
+    offsets = [_align(8 + len(header))]
+    for array in arrays:
+        offsets.append(_align(offsets[-1] + array.nbytes))
+
+    buffer = bytearray(offsets[-1])
+    buffer[:8] = len(header).to_bytes(8, "little")
+    buffer[8 : 8 + len(header)] = header
+    view = np.frombuffer(buffer, dtype=np.uint8)
+    for array, offset in zip(arrays, offsets):
+        view[offset : offset + array.nbytes] = np.ascontiguousarray(array).view(np.uint8)
+    return buffer
+
+
+def _unpack(buffer, copy=True):
+    """
+    Rebuild an NQobj from a buffer made by _pack. With copy False, the arrays of the NQobj are views of the
+    buffer, which has to stay alive as long as the NQobj. They are not marked read-only, as the Cython kernels of
+    QuTiP only accept writable buffers, so such an NQobj should not be modified in place.
+    """
+    buffer = memoryview(buffer)
+    header_length = int.from_bytes(buffer[:8], "little")
+    header = json.loads(bytes(buffer[8 : 8 + header_length]))
+    offset = _align(8 + header_length)
+    arrays = []
+    for dtype, length in header["arrays"]:
+        array = np.frombuffer(buffer, dtype=dtype, count=length, offset=offset)
+        arrays.append(array.copy() if copy else array)
+        offset = _align(offset + array.nbytes)
+
+    # The Qobj constructor costs more than the unpacking itself for small NQobj, so only the fields are collected.
+    q = qt.Qobj() if DEBUG_VALIDATION else types.SimpleNamespace()
+    q.data = fast_csr_matrix(tuple(arrays), shape=tuple(header["shape"]))
+    q.dims = header["dims"]
+    q._isherm = header["isherm"]
+    q._isunitary = header["isunitary"]
+    q.superrep = header["superrep"]
+    # Names are interned, such that the many NQobj of a sweep share their name strings.
+    names = [[sys.intern(name) for name in names] for names in header["names"]]
+    return NQobj._trusted(q, names, header["kind"])
+
+
+def _align(offset, alignment=16):
+    return -(-offset // alignment) * alignment
+
+
 def _permute2(Q, order):
     """
     Similar function as _permute from qutip but this allows for permutation of non-square matrixes.
@@ -622,6 +926,51 @@ def _find_missing_dict(missing_names, Q_other, transpose=False):
     return missing_dict
 
 
+def _same_modes(Q):
+    """
+    Check if an NQobj has the same names with the same dimensions on both axes, in any order.
+    """
+    return dict(zip(Q.names[0], Q.dims[0])) == dict(zip(Q.names[1], Q.dims[1]))
+
+
+def _digits(names, dims):
+    """
+    Function that returns the index of a mode in flat indices of a space with names and dims.
+    """
+    strides = dict(zip(names, np.cumprod([1] + list(dims[:0:-1]))[::-1]))
+    dim_of_name = dict(zip(names, dims))
+    return lambda indices, name: (indices // int(strides[name])) % dim_of_name[name]
+
+
+def _is_square_named(Q):
+    """
+    Check if an NQobj has the same names in the same order with the same dimensions on both axes.
+    """
+    return Q.names[0] == Q.names[1] and Q.dims[0] == Q.dims[1]
+
+
+def _align_to_order(Q, order, dims):
+    """
+    Add the modes in order that are missing in a square NQobj and permute it to order.
+
+    Parameters:
+    - Q: Square NQobj (see _is_square_named).
+    - order: List of names of the output, which includes all names of Q.
+    - dims: Dictionary with the dimension of every name in order.
+
+    Returns:
+    - The NQobj with names [order, order].
+    """
+    if Q.names[0] == order:
+        return Q
+    missing_dict = {name: [dims[name], dims[name]] for name in order if name not in Q.names[0]}
+    if missing_dict:
+        Q = _adding_missing_modes(Q, missing_dict, kind=Q.kind)
+    if Q.names[0] != order:
+        Q = Q.permute(order)
+    return Q
+
+
 def _adding_missing_modes(Q, dict_missing_modes, kind="oper"):
     """
     Add missing modes to an NQobj based on the missing modes dictionary.
@@ -643,22 +992,18 @@ def _adding_missing_modes(Q, dict_missing_modes, kind="oper"):
         # If the NQobj kind is an operator
         if kind == "oper":
             assert dims[0] == dims[1], "For adding eye matrixes they need to be square"
-            modes.append(NQobj(qt.qeye(dims[0]), names=name, kind="oper"))
+            modes.append(NQobj._trusted(qt.qeye(dims[0]), [[name], [name]], "oper"))
 
         # If the NQobj kind is a quantum state
         if kind == "state":
             if not None in dims:
                 modes.append(
-                    NQobj(
-                        qt.basis(dims[0], 0) * qt.basis(dims[1], 0).dag(),
-                        names=name,
-                        kind="state",
-                    )
+                    NQobj._trusted(qt.basis(dims[0], 0) * qt.basis(dims[1], 0).dag(), [[name], [name]], "state")
                 )
             elif dims[0] is None:
-                modes.append(NQobj(qt.basis(dims[1], 0).dag(), names=[[], [name]], kind="state"))
+                modes.append(NQobj._trusted(qt.basis(dims[1], 0).dag(), [[], [name]], "state"))
             elif dims[1] is None:
-                modes.append(NQobj(qt.basis(dims[0], 0), names=name, kind="state"))
+                modes.append(NQobj._trusted(qt.basis(dims[0], 0), [[name], [name]], "state"))
 
     # Return a tensor product of the original NQobj with the added modes
-    return tensor(Q, *modes)
+    return _tensor_trusted(Q, *modes)
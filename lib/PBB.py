@@ -5,6 +5,7 @@ import qutip as qt
 
 import lib.NQobj as nq
 import lib.states as st
+from lib.operator_bank import banked
 
 
 def conditional_amplitude_reflection(r_u, t_u, l_u, r_d, t_d, l_d, dim=2):
@@ -128,6 +129,7 @@ def conditional_phase_reflection(r_u, l_u, r_d, l_d, dim=2):
     return cav_tot
 
 
+@banked
 def unitary_beamsplitter(theta=0, dim=2):
     """
     Physical Building Block of a beam splitter.
@@ -154,6 +156,7 @@ def unitary_beamsplitter(theta=0, dim=2):
     return BS
 
 
+@banked
 def loss(loss=0.5, dim=2):
     """
     Physical Building Block for photon loss.
@@ -183,6 +186,7 @@ def loss(loss=0.5, dim=2):
     return LossOp
 
 
+@banked
 def waveplate(theta=0, dim=2):
     """
     Physical Building Block of a waveplate.
@@ -210,6 +214,7 @@ def waveplate(theta=0, dim=2):
     return WP
 
 
+@banked
 def spontaneous_emission_ideal(dim=2):
     """
     Physical Building Block of an ideal spin-dependent spontaneous emission (SPI).
@@ -235,6 +240,7 @@ def spontaneous_emission_ideal(dim=2):
     return SE_ideal
 
 
+@banked
 def spontaneous_emission_error(dim=2):
     """
     Physical Building Block of an erroneous spin-dependent spontaneous emission (SPI).
@@ -258,6 +264,7 @@ def spontaneous_emission_error(dim=2):
     return SE_error
 
 
+@banked
 def spontaneous_two_photon_emission(dim=3):
     """
     Physical Building Block of a two-photon emission error in spin-dependent spontaneous emission (SPI).
@@ -281,6 +288,7 @@ def spontaneous_two_photon_emission(dim=3):
     return SE_two_photon
 
 
+@banked
 def phase(theta=0, dim=2):
     """
     Physical Building Block of a phase shift of a photonic mode.
@@ -303,6 +311,7 @@ def phase(theta=0, dim=2):
     return phase_operator
 
 
+@banked
 def no_vacuum_projector(name, dim):
     """
     Physical Building Block for a no-vacuum projector.
@@ -0,0 +1,268 @@
+"""
+Batch of protocol sweeps on one shared worker pool, run with: python -m lib.batch sweeps.toml
+
+The configuration file (TOML or JSON) lists the sweeps, for example:
+
+    workers = 16
+    save_folder = "results"
+
+    [[sweeps]]
+    protocol = "protocols.tutorial_protocols.ProtocolA"
+    save_name = "ProtocolA"
+    parameters = {kappa_in = 240e9, kappa_loss = 89e9, g = 6.81e9, dim = 3, ...}
+    sweep_parameters = {alpha = {linspace = [1e-7, 0.3, 500]}}
+
+Swept values are a list or one of {linspace = [start, stop, num]}, {geomspace = ...}, {logspace = ...} or
+{arange = [start, stop, step]}. The other keys of a sweep (e.g. store_dm_heralded, sampling, rate_threshold,
+cache) are passed to ProtocolSweep, a cache as the folder of a ResultCache. save_folder, workers, backend and
+blas_threads can be set per batch, and save_folder also per sweep.
+"""
+import argparse
+import functools
+import importlib
+import json
+import multiprocessing as multi
+import os
+import time
+import tomllib
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+import lib.protocol as protocol_module
+from lib.protocol import (  # pylint: disable=protected-access
+    _blas_thread_limit,
+    _check_blas_threads,
+    _limit_blas_threads,
+    _serial_call,
+    _serial_time,
+    _timed_call,
+)
+from lib.result_cache import ResultCache
+from lib.scheduling import CostScheduler
+
+# Functions of numpy that can generate swept values in a configuration file.
+SWEEP_VALUE_FUNCTIONS = {
+    "linspace": np.linspace,
+    "geomspace": np.geomspace,
+    "logspace": np.logspace,
+    "arange": np.arange,
+}
+
+
+class BatchSweep:
+    """
+    This class runs the points of many sweeps on one worker pool, such that all workers stay busy until the
+    last sweep finishes instead of idling at the end of every sweep.
+
+    The calls of all sweeps are distributed by one CostScheduler, with the cost keys of every sweep (see
+    ProtocolSweep.sweep_cost_keys) kept apart per sweep: the first call of every group calibrates its cost and
+    the most expensive calls are dispatched first, such that the cheap calls fill the tail of the batch. Every
+    sweep is completed and saved as soon as its last call returns.
+
+    Attributes:
+            sweeps : list of ProtocolSweep
+                Sweeps of the batch, with save_results for the datasets to be written.
+            workers : int
+                Number of workers. Default is the number of CPUs.
+            backend : str
+                "process" or "thread", see ProtocolSweep.
+            blas_threads : int or None
+                Number of BLAS threads per worker, see ProtocolSweep.
+            progress_interval : float
+                Minimum time in seconds between progress lines.
+            speedup : float
+                Estimated time of a serial run divided by the wall time of the last run, see ProtocolSweep.starmap.
+            parallel_efficiency : float
+                CPU time of all calls divided by the wall time of the last run and the number of workers.
+            tail_time : float
+                Load-imbalance tail of the last run, see CostScheduler.
+    """
+
+    def __init__(self, sweeps, workers=None, backend="process", blas_threads=1, progress_interval=10):
+        """
+        Initialize the BatchSweep class.
+
+        Parameters:
+        ----------
+        sweeps : list of ProtocolSweep
+            Sweeps to run.
+        workers : int, optional
+            Number of workers. Default is the number of CPUs.
+        backend : str, optional
+            "process" or "thread". Default is "process".
+        blas_threads : int or None, optional
+            Number of BLAS threads per worker. Default is 1.
+        progress_interval : float, optional
+            Minimum time in seconds between progress lines. Default is 10.
+        """
+        if backend not in ("process", "thread"):
+            raise ValueError("backend should be process or thread")
+        self.sweeps = list(sweeps)
+        self.workers = workers or os.cpu_count()
+        self.backend = backend
+        self.blas_threads = blas_threads
+        self.progress_interval = progress_interval
+        self.speedup = None
+        self.parallel_efficiency = None
+        self.tail_time = None
+        _check_blas_threads(blas_threads)
+
+    @classmethod
+    def from_config(cls, path, **kwargs):
+        """
+        Create a batch from a TOML or JSON configuration file, see the module docstring for its format.
+
+        Parameters:
+        ----------
+        path : str
+            Path of the configuration file, TOML if it ends with .toml and JSON otherwise.
+        **kwargs : dict
+            Arguments of BatchSweep that replace those of the configuration file.
+
+        Returns:
+        -------
+        BatchSweep
+        """
+        config = load_config(path)
+        sweeps = [sweep_from_config(entry, config.get("save_folder")) for entry in config["sweeps"]]
+        options = {key: config[key] for key in ("workers", "backend", "blas_threads") if key in config}
+        options.update({key: value for key, value in kwargs.items() if value is not None})
+        return cls(sweeps, **options)
+
+    def run(self):
+        """Run all sweeps and complete every sweep (dataset, validation, saving) when its last call returns."""
+        calls = []
+        cost_keys = []
+        owners = []
+        results = []
+        for sweep_index, sweep in enumerate(self.sweeps):
+            function, arguments = sweep.sweep_calls()
+            calls += [(function, values) for values in arguments]
+            # Points of different sweeps never share a cost.
+            cost_keys += [(sweep_index, key) for key in sweep.sweep_cost_keys(arguments)]
+            owners += [(sweep_index, call_index) for call_index in range(len(arguments))]
+            results.append([None] * len(arguments))
+        remaining = [len(sweep_results) for sweep_results in results]
+        scheduler = CostScheduler(self.workers)
+        time_start = time.time()
+        progress = {"finished": 0, "time": time_start}
+
+        def on_result(index, result):
+            sweep_index, call_index = owners[index]
+            results[sweep_index][call_index] = result
+            remaining[sweep_index] -= 1
+            progress["finished"] += 1
+            if remaining[sweep_index] == 0:
+                self._complete(sweep_index, results[sweep_index], time_start)
+            if time.time() - progress["time"] >= self.progress_interval or progress["finished"] == len(calls):
+                progress["time"] = time.time()
+                self._print_progress(scheduler, progress["finished"], len(calls), progress["time"] - time_start)
+
+        # The first call runs in this process, its time is the serial reference of the speedup.
+        done = {}
+        serial = []
+        if calls:
+            serial.append(_serial_call(functools.partial(_timed_call, calls[0][0]), calls[0][1], done, 0))
+            on_result(0, done[0][0])
+
+        def on_pool_result(index, result):
+            on_result(index + 1, result)
+
+        # Threads share the BLAS thread limit of the process, processes set it in their initializer.
+        blas_threads = self.blas_threads if self.backend == "thread" else None
+        if len(calls) > 1:
+            with _blas_thread_limit(blas_threads), self._pool() as pool:
+                scheduler.run(pool, calls[1:], cost_keys[1:], on_result=on_pool_result)
+
+        self.tail_time = scheduler.tail_time
+        time_wall = time.time() - time_start
+        cpu_time = sum(cpu_time for _, cpu_time in done.values()) + sum(scheduler.cpu_times)
+        self.speedup = _serial_time(serial, cpu_time) / time_wall if time_wall > 0 else np.nan
+        self.parallel_efficiency = cpu_time / (time_wall * self.workers) if time_wall > 0 else np.nan
+        print(
+            f"Batch of {len(self.sweeps)} sweeps took {time_wall:.1f} s, speedup {self.speedup:.1f}x against serial, "
+            f"parallel efficiency {self.parallel_efficiency:.0%}, load-imbalance tail {self.tail_time:.1f} s"
+        )
+
+    def _pool(self):
+        if self.backend == "thread":
+            return ThreadPool(self.workers)
+        return multi.Pool(self.workers, initializer=_limit_blas_threads, initargs=(self.blas_threads,))
+
+    def _complete(self, sweep_index, results, time_start):
+        sweep = self.sweeps[sweep_index]
+        sweep.sweep_backend = self.backend
+        sweep.speedup = None
+        sweep.parallel_efficiency = None
+        time_wall = time.time() - time_start
+        sweep.complete_run(sweep.sweep_data_vars(results))
+        print(f"Sweep {sweep_index} ({sweep.save_name}) finished after {time_wall:.1f} s")
+
+    @staticmethod
+    def _print_progress(scheduler, finished, total, time_elapsed):
+        cpu_done = sum(cpu_time for cpu_time in scheduler.cpu_times if cpu_time is not None)
+        time_remaining = scheduler.remaining_cost() * time_elapsed / cpu_done if cpu_done > 0 else np.nan
+        print(
+            f"{finished}/{total} calls ({100 * finished / total:.0f}%), {time_elapsed:.0f} s elapsed, "
+            f"about {time_remaining:.0f} s remaining"
+        )
+
+
+def load_config(path):
+    """Read a batch configuration from a TOML (.toml) or JSON file."""
+    with open(path, "rb") as file:
+        if path.endswith(".toml"):
+            return tomllib.load(file)
+        return json.load(file)
+
+
+def sweep_from_config(entry, save_folder=None):
+    """
+    Create a ProtocolSweep from the configuration of one sweep.
+
+    Parameters:
+    ----------
+    entry : dict
+        protocol (import path of the class), parameters, sweep_parameters and optional save_folder, save_name,
+        cache (folder of a ResultCache) and keyword arguments of ProtocolSweep.
+    save_folder : str, optional
+        Folder of the dataset if the entry has none. Without any folder, the dataset is not saved.
+
+    Returns:
+    -------
+    ProtocolSweep
+    """
+    entry = dict(entry)
+    module_name, class_name = entry.pop("protocol").rsplit(".", 1)
+    protocol = getattr(importlib.import_module(module_name), class_name)
+    sweep_parameters = {name: _sweep_values(values) for name, values in entry.pop("sweep_parameters").items()}
+    parameters = dict(entry.pop("parameters"))
+    # ProtocolSweep removes the swept parameters from parameters for the attrs of the dataset.
+    for name, values in sweep_parameters.items():
+        parameters.setdefault(name, values[0])
+    entry.setdefault("save_folder", save_folder)
+    entry.setdefault("save_name", class_name)
+    if entry["save_folder"] is not None:
+        os.makedirs(entry["save_folder"], exist_ok=True)
+    if isinstance(entry.get("cache"), str):
+        entry["cache"] = ResultCache(entry["cache"])
+    return protocol_module.ProtocolSweep(
+        protocol, parameters, sweep_parameters, save_results=entry["save_folder"] is not None, **entry
+    )
+
+
+def _sweep_values(values):
+    if isinstance(values, dict):
+        ((function, arguments),) = values.items()
+        return SWEEP_VALUE_FUNCTIONS[function](*arguments)
+    return np.array(values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the sweeps of a configuration file on one worker pool.")
+    parser.add_argument("config", help="TOML or JSON file with the sweeps")
+    parser.add_argument("--workers", type=int, help="number of workers, default from the file or all CPUs")
+    parser.add_argument("--backend", choices=["process", "thread"], help="worker pool, default process")
+    arguments = parser.parse_args()
+    BatchSweep.from_config(arguments.config, workers=arguments.workers, backend=arguments.backend).run()
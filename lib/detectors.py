@@ -0,0 +1,241 @@
+import math
+
+import numpy as np
+
+import lib.LBB as lbb
+import lib.NQobj as nq
+
+
+class Detector:
+    """
+    This class describes a photon detector on a single mode by its diagonal POVM elements.
+
+    Photon-number measurements are diagonal in the Fock basis, so every outcome is described by the
+    probability of that outcome given n photons in the mode. Photons are detected with probability
+    efficiency each, and with probability dark_count a single extra count is registered.
+
+    Attributes:
+            efficiency : float
+                Probability that a photon is detected. Default is 1.
+            dark_count : float
+                Probability of a dark count during the detection window. Default is 0.
+    """
+
+    def __init__(self, efficiency=1, dark_count=0):
+        """
+        Initialize the Detector class.
+
+        Parameters:
+        ----------
+        efficiency : float, optional
+            Probability that a photon is detected. Default is 1.
+        dark_count : float, optional
+            Probability of a dark count during the detection window. Default is 0.
+        """
+        self.efficiency = efficiency
+        self.dark_count = dark_count
+
+    def count_probabilities(self, dim):
+        """
+        Probability of k counts given n photons.
+
+        Parameters:
+        ----------
+        dim : int
+            Dimension of the photonic mode.
+
+        Returns:
+        -------
+        np.ndarray
+            Array of shape (dim + 1, dim) with element [k, n], as a dark count can add a count to dim - 1 photons.
+        """
+        counts = np.zeros((dim + 1, dim))
+        for n in range(dim):
+            for k in range(n + 1):
+                counts[k, n] = math.comb(n, k) * self.efficiency**k * (1 - self.efficiency) ** (n - k)
+        return (1 - self.dark_count) * counts + self.dark_count * np.roll(counts, 1, axis=0)
+
+    def povm(self, dim):
+        """
+        Diagonal POVM elements of the detector. To be implemented in subclasses.
+
+        Parameters:
+        ----------
+        dim : int
+            Dimension of the photonic mode.
+
+        Returns:
+        -------
+        np.ndarray
+            Array of shape (outcome, dim) with the diagonal of every POVM element.
+        """
+        pass
+
+
+class ThresholdDetector(Detector):
+    """
+    Detector that only distinguishes no click (outcome 0) from a click (outcome 1).
+    """
+
+    def povm(self, dim):
+        counts = self.count_probabilities(dim)
+        return np.array([counts[0], counts[1:].sum(axis=0)])
+
+
+class NumberResolvingDetector(Detector):
+    """
+    Photon-number resolving detector, with outcome k for k counts up to max_count.
+
+    Attributes:
+            max_count : int or None
+                Largest resolved number of counts, higher numbers give outcome max_count.
+                Default is None, for which all numbers of counts that fit in the mode are resolved.
+    """
+
+    def __init__(self, efficiency=1, dark_count=0, max_count=None):
+        """
+        Initialize the NumberResolvingDetector class.
+
+        Parameters:
+        ----------
+        efficiency : float, optional
+            Probability that a photon is detected. Default is 1.
+        dark_count : float, optional
+            Probability of a dark count during the detection window. Default is 0.
+        max_count : int, optional
+            Largest resolved number of counts. Default is None (resolve up to dim counts).
+        """
+        super().__init__(efficiency=efficiency, dark_count=dark_count)
+        self.max_count = max_count
+
+    def povm(self, dim):
+        counts = self.count_probabilities(dim)
+        if self.max_count is None or self.max_count >= dim:
+            return counts
+        return np.concatenate([counts[: self.max_count], counts[self.max_count :].sum(axis=0, keepdims=True)])
+
+
+class ClickStatistics:
+    """
+    This class holds the joint outcome distribution of a set of detectors and the conditional spin states.
+
+    Attributes:
+            modes : list of str
+                Names of the detected photonic modes, in the order of the outcome axes.
+            spin_names : list of str
+                Names of the spins of the conditional states.
+            spin_dims : list of int
+                Dimensions of the spins.
+            dm_spin : np.ndarray
+                Unnormalized spin density matrices of shape (*outcomes, d, d), one for every click pattern.
+    """
+
+    def __init__(self, modes, spin_names, spin_dims, dm_spin):
+        self.modes = list(modes)
+        self.spin_names = list(spin_names)
+        self.spin_dims = list(spin_dims)
+        self.dm_spin = dm_spin
+
+    @property
+    def probabilities(self):
+        """Probability of every click pattern, an array with one axis per detected mode."""
+        return np.real(np.trace(self.dm_spin, axis1=-2, axis2=-1))
+
+    def dm(self, pattern):
+        """
+        Unnormalized spin density matrix for a (partial) click pattern.
+
+        Parameters:
+        ----------
+        pattern : dict
+            Outcome of the detected modes, e.g. {"Ea": 1, "Eb": 0}. Modes that are not given can have any outcome.
+
+        Returns:
+        -------
+        NQobj
+            Spin density matrix with the probability of the pattern as trace.
+        """
+        index = tuple(pattern.get(mode, slice(None)) for mode in self.modes)
+        selected = self.dm_spin[index]
+        matrix = selected.reshape((-1,) + selected.shape[-2:]).sum(axis=0)
+        return nq.NQobj(matrix, dims=[self.spin_dims, self.spin_dims], names=list(self.spin_names), kind="state")
+
+    def herald(self, patterns):
+        """
+        Unnormalized spin density matrix of a herald branch that accepts several (disjoint) click patterns.
+
+        Parameters:
+        ----------
+        patterns : list of dict
+            Click patterns of the branch, see dm.
+
+        Returns:
+        -------
+        NQobj
+            Spin density matrix with the probability of the branch as trace.
+        """
+        return sum((self.dm(pattern) for pattern in patterns[1:]), self.dm(patterns[0]))
+
+
+def photonic_modes(dm):
+    """Names of the photonic modes of a density matrix, all modes that are not spins."""
+    return [name for name in dm.names[0] if name not in lbb.SPIN_NAMES]
+
+
+def click_statistics(dm, detectors):
+    """
+    Compute the probability and conditional spin state of every click pattern of a set of detectors.
+
+    Only the blocks of dm that are diagonal in the photonic modes contribute to photon-number measurements,
+    so these are extracted from the sparse matrix once and the POVM of every detector is contracted with its
+    mode. Photonic modes without detector are traced out. No operator on the full space is built.
+
+    Parameters:
+    ----------
+    dm : NQobj
+        Density matrix of the spins and photonic modes.
+    detectors : dict
+        Detector of every detected photonic mode, e.g. {"Ea": ThresholdDetector(), ...}.
+
+    Returns:
+    -------
+    ClickStatistics
+        Joint outcome distribution and conditional spin states.
+    """
+    names = dm.names[0]
+    dims = dm.dims[0]
+    missing = set(detectors) - set(names)
+    if missing:
+        raise ValueError(f"The modes {sorted(missing)} are not present in dm.")
+    modes = list(detectors)
+    # The spins are sorted by name, such that the conditional states of different runs share the same order.
+    spin_axes = sorted((i for i, name in enumerate(names) if name in lbb.SPIN_NAMES), key=lambda i: names[i])
+    mode_axes = [names.index(mode) for mode in modes]
+    photon_axes = [i for i in range(len(names)) if i not in spin_axes]
+    spin_dims = [dims[i] for i in spin_axes]
+    d = int(np.prod(spin_dims))
+
+    # Keep the entries that are diagonal in all photonic modes.
+    coo = dm.data.tocoo()
+    rows = np.unravel_index(coo.row, dims)
+    cols = np.unravel_index(coo.col, dims)
+    diagonal = np.ones(coo.nnz, dtype=bool)
+    for axis in photon_axes:
+        diagonal &= rows[axis] == cols[axis]
+
+    spin_row = np.ravel_multi_index([rows[axis][diagonal] for axis in spin_axes], spin_dims) if spin_axes else 0
+    spin_col = np.ravel_multi_index([cols[axis][diagonal] for axis in spin_axes], spin_dims) if spin_axes else 0
+    mode_dims = [dims[axis] for axis in mode_axes]
+    photons = np.ravel_multi_index([rows[axis][diagonal] for axis in mode_axes], mode_dims)
+
+    blocks = np.zeros((int(np.prod(mode_dims)), d, d), dtype=complex)
+    np.add.at(blocks, (photons, spin_row, spin_col), coo.data[diagonal])
+    blocks = blocks.reshape(mode_dims + [d, d])
+
+    # Replace the photon number axis of every mode by its outcome axis.
+    for axis, (mode, dim) in enumerate(zip(modes, mode_dims)):
+        povm = detectors[mode].povm(dim)
+        blocks = np.moveaxis(np.tensordot(povm, blocks, axes=(1, axis)), 0, axis)
+
+    return ClickStatistics(modes, [names[axis] for axis in spin_axes], spin_dims, blocks)
+
@@ -0,0 +1,93 @@
+"""
+Benchmark of the cold-start time of lib, run with: python -m lib.import_benchmark
+
+Every sweep worker that is started with spawn and every script pays the import time of lib. qutip itself
+dominates that time, so the budget is set on the time lib adds on top of importing qutip, and on the heavy
+modules that may not be imported before they are used.
+"""
+import json
+import subprocess
+import sys
+
+# Maximum time in seconds that importing a module of lib may add to the import of qutip.
+IMPORT_BUDGETS = {
+    "lib.NQobj": 0.05,
+    "lib.LBB": 0.1,
+    "lib.protocol": 0.15,
+    "lib.loss_polynomial": 0.15,
+    "lib.surrogate": 0.15,
+}
+
+# Modules that are only imported on first use, when building or storing sweep datasets.
+LAZY_MODULES = ["pandas", "h5netcdf", "scipy.stats"]
+
+_SCRIPT = """
+import json, sys, time
+time_start = time.perf_counter()
+import qutip
+time_qutip = time.perf_counter() - time_start
+import {module}
+time_module = time.perf_counter() - time_start - time_qutip
+print(json.dumps({{"qutip": time_qutip, "module": time_module, "loaded": [m for m in {lazy} if m in sys.modules]}}))
+"""
+
+
+def import_time(module, repeats=5):
+    """
+    Measure the import time of a module in fresh interpreters.
+
+    Parameters:
+    ----------
+    module : str
+        Name of the module, e.g. "lib.protocol".
+    repeats : int, optional
+        Number of interpreters, the fastest is reported. Default is 5.
+
+    Returns:
+    -------
+    dict
+        Import time of qutip and the additional import time of module in seconds, and the modules
+        of LAZY_MODULES that were imported.
+    """
+    results = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _SCRIPT.format(module=module, lazy=LAZY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda result: result["module"])
+
+
+def check_import_budgets(repeats=5):
+    """
+    Measure the import time of every module in IMPORT_BUDGETS and compare it with its budget.
+
+    Parameters:
+    ----------
+    repeats : int, optional
+        Number of interpreters per module. Default is 5.
+
+    Returns:
+    -------
+    bool
+        True if all modules are within their budget and no lazy module is imported.
+    """
+    within_budget = True
+    for module, budget in IMPORT_BUDGETS.items():
+        result = import_time(module, repeats=repeats)
+        ok = result["module"] <= budget and not result["loaded"]
+        within_budget &= ok
+        print(
+            f"{module:<19} {1e3 * result['module']:7.1f} ms (budget {1e3 * budget:.0f} ms, "
+            f"qutip {1e3 * result['qutip']:.0f} ms) {'ok' if ok else 'FAIL'}"
+        )
+        if result["loaded"]:
+            print(f"{'':<19} imported eagerly: {', '.join(result['loaded'])}")
+    return within_budget
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_import_budgets() else 1)
@@ -0,0 +1,32 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Import a module on first attribute access instead of immediately.
+
+    Used for heavy modules that are only needed by part of lib, e.g. xarray (which imports pandas) is only needed
+    to build and store sweep datasets, not to run a protocol.
+
+    Parameters:
+    ----------
+    name : str
+        Full name of the module, e.g. "xarray".
+
+    Returns:
+    -------
+    module
+        The module, which is executed when one of its attributes is accessed for the first time.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,226 @@
+from copy import copy
+
+import numpy as np
+from numpy.polynomial import chebyshev
+
+import lib.protocol as protocol_module
+from lib.lazy_import import lazy_import
+
+xr = lazy_import("xarray")
+
+
+class LossPolynomial:
+    """
+    This class compiles the results of a protocol into polynomials in its loss parameters.
+
+    Loss parameters that enter a protocol only through LBB.mode_loss change the heralded density matrices
+    polynomially in sqrt(1 - loss) of every mode. The per-branch rate and the unnormalized per-branch fidelity
+    (fidelity * rate) are therefore polynomials in x = (1 - loss) ** (1 / root), where root is 2 for a loss
+    that is applied directly and e.g. 4 for link_loss in ProtocolA/B (applied as 1 - sqrt(1 - link_loss) per
+    half of the link). The polynomials are found by running the protocol on a grid of Chebyshev nodes in x
+    and interpolating, with the number of nodes tripled until random validation runs agree within tol.
+    Sweeps over the loss parameters are then vectorized polynomial evaluations.
+
+    Attributes:
+            protocol : subclass of Protocol
+                Protocol class to compile.
+            parameters : dict
+                Parameters of the protocol, the values of the loss parameters are ignored.
+            loss_parameters : list of str
+                Names of the loss parameters.
+            roots : dict
+                Root of (1 - loss) used as variable of the polynomial for every loss parameter.
+            coefficients : dict
+                Chebyshev coefficients of "rate" and "fidelity_unnormalized", with one axis per loss parameter
+                followed by a branch axis. None before compile.
+    """
+
+    def __init__(self, protocol, parameters, loss_parameters, roots=None, tol=1e-9, max_nodes=108, cache=None):
+        """
+        Initialize the LossPolynomial class.
+
+        Parameters:
+        ----------
+        protocol : subclass of Protocol
+            Protocol class to compile.
+        parameters : dict
+            Parameters of the protocol.
+        loss_parameters : list of str
+            Names of the loss parameters.
+        roots : dict, optional
+            Root of (1 - loss) for every loss parameter. Default is 2 for every loss parameter.
+        tol : float, optional
+            Relative tolerance of the validation runs. Default is 1e-9.
+        max_nodes : int, optional
+            Maximum number of Chebyshev nodes per loss parameter. Default is 108.
+        cache : ResultCache, optional
+            Cache for the protocol runs; the nodes are nested, so refinement reuses earlier runs.
+        """
+        self.protocol = protocol
+        self.parameters = parameters
+        self.loss_parameters = list(loss_parameters)
+        self.roots = {name: 2 for name in self.loss_parameters}
+        if roots is not None:
+            self.roots.update(roots)
+        self.tol = tol
+        self.max_nodes = max_nodes
+        self.cache = cache
+        self.coefficients = None
+        # Largest absolute value of every branch quantity at the nodes, the scale of the validation errors.
+        self._scales = None
+
+    def compile(self, number_of_nodes=4, number_of_validation_points=3, seed=0):
+        """
+        Find the polynomials by interpolation on Chebyshev nodes, refining until validation succeeds.
+
+        Parameters:
+        ----------
+        number_of_nodes : int, optional
+            Initial number of nodes per loss parameter. Default is 4.
+        number_of_validation_points : int, optional
+            Number of random points at which the protocol is run to validate the polynomials. Default is 3.
+        seed : int, optional
+            Seed of the random validation points. Default is 0.
+        """
+        rng = np.random.default_rng(seed)
+        validation_x = rng.uniform(0.05, 1, size=(number_of_validation_points, len(self.loss_parameters)))
+        validation = [self._run_protocol(x) for x in validation_x]
+
+        while True:
+            self.coefficients = self._interpolate(number_of_nodes)
+            predicted = [self._evaluate_branches(x[:, None]) for x in validation_x]
+            if all(
+                np.allclose(predicted[i][key][0], validation[i][key], rtol=self.tol, atol=self.tol * scale)
+                for i in range(number_of_validation_points)
+                for key, scale in self._scales.items()
+            ):
+                return
+            if 3 * number_of_nodes > self.max_nodes:
+                raise RuntimeError(
+                    "The results are not polynomial in (1 - loss) ** (1 / root) up to max_nodes. "
+                    "Check that the loss parameters only enter through mode_loss and that roots are correct."
+                )
+            number_of_nodes *= 3  # Chebyshev nodes of the first kind are nested when tripled.
+
+    def __call__(self, **loss_values):
+        """
+        Evaluate fidelity and rate at (arrays of) values of the loss parameters, broadcast against each other.
+
+        Returns:
+        -------
+        tuple
+            Arrays with the fidelity and rate, weighted and summed over the branches as in Protocol.herald.
+        """
+        values = np.broadcast_arrays(*[np.asarray(loss_values[name], dtype=float) for name in self.loss_parameters])
+        shape = values[0].shape
+        x = np.array([self._to_x(name, value.ravel()) for name, value in zip(self.loss_parameters, values)])
+        branches = self._evaluate_branches(x)
+        fidelity, rate = _combine_branches(branches["fidelity_unnormalized"], branches["rate"])
+        return fidelity.reshape(shape), rate.reshape(shape)
+
+    def sweep(self, sweep_parameters):
+        """
+        Evaluate fidelity and rate on a grid of loss parameters, like ProtocolSweep.run.
+
+        Parameters:
+        ----------
+        sweep_parameters : dict
+            Values of every loss parameter.
+
+        Returns:
+        -------
+        xr.Dataset
+            Dataset with fidelity and rate on the grid.
+        """
+        if self.coefficients is None:
+            raise RuntimeError("First compile the polynomials.")
+        results = {}
+        for key, coefficients in self.coefficients.items():
+            for name in self.loss_parameters:
+                # Contract the first polynomial axis with the Chebyshev polynomials at the sweep values.
+                vander = chebyshev.chebvander(
+                    self._to_t(name, np.asarray(sweep_parameters[name])), coefficients.shape[0] - 1
+                )
+                coefficients = np.moveaxis(np.tensordot(vander, coefficients, axes=(1, 0)), 0, -1)
+            results[key] = np.moveaxis(coefficients, 0, -1)  # Move the branch axis to the end.
+        fidelity, rate = _combine_branches(results["fidelity_unnormalized"], results["rate"])
+
+        data_vars = {"fidelity": (self.loss_parameters, fidelity), "rate": (self.loss_parameters, rate)}
+        parameters = copy(self.parameters)
+        for parameter in self.loss_parameters:
+            parameters.pop(parameter, None)
+        return xr.Dataset(data_vars, {name: sweep_parameters[name] for name in self.loss_parameters}, attrs=parameters)
+
+    def _interpolate(self, number_of_nodes):
+        """Run the protocol on the Chebyshev grid and compute the Chebyshev coefficients."""
+        t_nodes = np.cos((2 * np.arange(number_of_nodes) + 1) * np.pi / (2 * number_of_nodes))
+        sweep_parameters = {name: self._to_loss(name, (t_nodes + 1) / 2) for name in self.loss_parameters}
+        parameters = dict(self.parameters, **{name: values[0] for name, values in sweep_parameters.items()})
+        sweep = protocol_module.ProtocolSweep(
+            self.protocol, parameters, sweep_parameters, cache=self.cache, store_dm_heralded=True
+        )
+        sweep.run()
+
+        dm_heralded = sweep.dataset.dm_heralded
+        values = self._branch_values(protocol_module.unpack_hermitian(dm_heralded.values), dm_heralded.attrs["names"])
+        self._scales = {key: np.max(np.abs(value)) for key, value in values.items()}
+
+        vander_inverse = np.linalg.inv(chebyshev.chebvander(t_nodes, number_of_nodes - 1))
+        coefficients = {}
+        for key, value in values.items():
+            for axis in range(len(self.loss_parameters)):
+                value = np.moveaxis(np.tensordot(vander_inverse, value, axes=(1, axis)), 0, axis)
+            coefficients[key] = value
+        return coefficients
+
+    def _evaluate_branches(self, x):
+        """Evaluate the per-branch polynomials at points x with shape (loss parameter, point)."""
+        results = {}
+        for key, coefficients in self.coefficients.items():
+            for i, x_axis in enumerate(x):
+                vander = chebyshev.chebvander(2 * x_axis - 1, coefficients.shape[0] - 1)
+                if i == 0:
+                    result = np.tensordot(vander, coefficients, axes=(1, 0))
+                else:
+                    result = np.einsum("pk...,pk->p...", result, vander)
+            results[key] = result
+        return results
+
+    def _run_protocol(self, x):
+        parameters = dict(self.parameters)
+        for name, x_value in zip(self.loss_parameters, x):
+            parameters[name] = self._to_loss(name, x_value)
+        protocol = self.protocol(parameters=parameters)
+        protocol.run()
+        packed, names, _ = protocol_module.pack_dm_heralded(protocol.dm_heralded)
+        return self._branch_values(protocol_module.unpack_hermitian(packed), names)
+
+    def _branch_values(self, dm_heralded, names):
+        """
+        Rate and unnormalized fidelity of every branch from the heralded density matrices in the last axes.
+
+        The unnormalized fidelity is computed as <target|dm|target>, which is linear in dm and thus exactly
+        polynomial, unlike the fidelity of qutip which involves a matrix square root.
+        """
+        targets = self.protocol(parameters=dict(self.parameters)).target_states
+        psi = np.array([target.permute(list(names)).full().ravel() for target in targets])
+        rate = np.real(np.trace(dm_heralded, axis1=-2, axis2=-1))
+        fidelity_unnormalized = np.real(np.einsum("bi,...bij,bj->...b", psi.conj(), dm_heralded, psi))
+        return {"rate": rate, "fidelity_unnormalized": fidelity_unnormalized}
+
+    def _to_loss(self, name, x):
+        return 1 - x ** self.roots[name]
+
+    def _to_x(self, name, loss):
+        return (1 - loss) ** (1 / self.roots[name])
+
+    def _to_t(self, name, loss):
+        return 2 * self._to_x(name, loss) - 1
+
+
+def _combine_branches(fidelity_unnormalized, rate):
+    """Total fidelity and rate from the per-branch values in the last axis, as in Protocol.herald."""
+    rate_total = rate.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fidelity_total = fidelity_unnormalized.sum(axis=-1) / rate_total
+    return fidelity_total, rate_total
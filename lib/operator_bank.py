@@ -0,0 +1,126 @@
+import contextlib
+import functools
+import pickle
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from multiprocessing import shared_memory
+
+import lib.NQobj as nq
+
+# Maximum number of operators computed in a process that are kept, the published operators are always kept.
+MAX_OPERATORS = 64
+
+# Operators computed in this process and operators attached from shared memory, by function and arguments.
+_operators = OrderedDict()
+_published = {}
+# Shared memory blocks that hold the published operators, kept open as long as the process lives.
+_memories = []
+# Guards the bank against the threads of a thread pool sweep, operators are computed outside of it.
+_lock = threading.Lock()
+
+
+def banked(function):
+    """
+    Decorator that memoizes an operator function of hashable arguments, e.g. a PBB, in the bank of the process.
+
+    Every call returns a new NQobj with its own names, which can be renamed in place, that shares the data of
+    the banked operator. The data should not be modified in place. Operators published by a parent process
+    (see published_operators and attach) are used without copy.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (function.__module__, function.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:  # Unhashable arguments are not banked.
+            return function(*args, **kwargs)
+        with _lock:
+            Q = _published.get(key)
+            if Q is None:
+                Q = _operators.get(key)
+                if Q is not None:
+                    _operators.move_to_end(key)
+        if Q is None:
+            # Threads that miss at the same time all compute the operator, the last one is kept.
+            Q = function(*args, **kwargs)
+            with _lock:
+                _operators[key] = Q
+                if len(_operators) > MAX_OPERATORS:
+                    _operators.popitem(last=False)
+        return nq.NQobj._trusted(Q, deepcopy(Q.names), Q.kind)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def published_operators():
+    """
+    Context in which all banked operators of this process are published in one block of shared memory.
+
+    The block holds an index with the key, offset and size of every operator, followed by the operators packed
+    as for pickling. Worker processes attach to it with attach, and it is released when the context exits.
+
+    Yields:
+    ------
+    str or None
+        Name of the shared memory, None if no operator is banked.
+    """
+    with _lock:
+        operators = {**_operators, **_published}
+    if not operators:
+        yield None
+        return
+
+    buffers = [nq._pack(Q) for Q in operators.values()]  # pylint: disable=protected-access
+    offsets = []
+    offset = 0
+    for buffer in buffers:
+        offsets.append(offset)
+        offset = nq._align(offset + len(buffer))  # pylint: disable=protected-access
+    index = pickle.dumps([(key, start, len(buffer)) for key, start, buffer in zip(operators, offsets, buffers)])
+    start = nq._align(8 + len(index))  # pylint: disable=protected-access
+
+    memory = shared_memory.SharedMemory(create=True, size=start + offset)
+    try:
+        memory.buf[:8] = len(index).to_bytes(8, "little")
+        memory.buf[8 : 8 + len(index)] = index
+        for buffer, offset in zip(buffers, offsets):
+            memory.buf[start + offset : start + offset + len(buffer)] = buffer
+        yield memory.name
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def attach(name):
+    """
+    Use the operators published by another process in the shared memory called name, without copy.
+
+    The shared memory is released by the publishing process, this process only keeps it mapped.
+
+    Parameters:
+    ----------
+    name : str or None
+        Name yielded by published_operators. Nothing is attached for None.
+    """
+    if name is None:
+        return
+    memory = shared_memory.SharedMemory(name=name)
+    index_length = int.from_bytes(memory.buf[:8], "little")
+    index = pickle.loads(memory.buf[8 : 8 + index_length])
+    start = nq._align(8 + index_length)  # pylint: disable=protected-access
+    with _lock:
+        for key, offset, size in index:
+            view = memory.buf[start + offset : start + offset + size]
+            _published[key] = nq._unpack(view, copy=False)  # pylint: disable=protected-access
+            _operators.pop(key, None)
+        _memories.append(memory)
+
+
+def clear():
+    """Remove all operators from the bank of this process, the attached shared memory stays mapped."""
+    with _lock:
+        _operators.clear()
+        _published.clear()
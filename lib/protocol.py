@@ -1,21 +1,42 @@
+import contextlib
 import datetime
 import functools
 import itertools
 import multiprocessing as multi
+import os
 import time
+import warnings
 from copy import copy
+from multiprocessing.pool import ThreadPool
 from os.path import join
 from typing import List, Optional
 
 import numpy as np
 import qutip as qt
-import xarray as xr
 
+import lib.detectors as det
 import lib.LBB as lbb
 import lib.NQobj as nq
+import lib.operator_bank as ob
+from lib.lazy_import import lazy_import
+from lib.result_cache import ResultCache
+from lib.scheduling import CostScheduler
+from lib.sparsification import SparsificationManager
+from lib.truncation import TruncationManager
+
+# xarray (and pandas) are only needed for sweep datasets, so they are imported on first use.
+xr = lazy_import("xarray")
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # Without threadpoolctl the number of BLAS threads is not limited.
+    threadpool_limits = None
 
 qt.settings.auto_tidyup = False
 
+# Parameters that change the size of a protocol run, sweep points that differ in them differ in cost.
+COST_PARAMETERS = ["dim", "ideal", "truncation_budget", "sparsification_budget"]
+
 
 class Protocol:
     """
@@ -30,6 +51,19 @@ class Protocol:
             dim : int
                 Dimension of photonic modes.
                 Default is 3 (minimum for using single photons and HOM interference).
+                With automatic truncation this is the maximum dimension of a photonic mode.
+            truncation_budget : float, optional
+                If present in the parameters, the dimension of every photonic mode is chosen automatically
+                such that at most this population is discarded per mode and per LBB (see TruncationManager).
+                The budget is not relative to the rate, the fidelity can change by up to the error over the rate.
+            sparsification_budget : float, optional
+                If present in the parameters, the smallest elements of the density matrix are dropped after every
+                LBB while the accumulated trace-norm error stays below this budget (see SparsificationManager).
+            detectors : dict, optional
+                Detector (see detectors.py) of every detected photonic mode. If given, the herald branches are
+                computed from the click statistics instead of herald_projectors.
+            herald_patterns : list of list of dict, optional
+                Disjoint click patterns, e.g. {"Ea": 1, "Eb": 0}, accepted by every herald branch.
 
     Additional arguments:
             photon_names : list
@@ -65,6 +99,12 @@ class Protocol:
         self.target_states: List[nq.NQobj] = []  # target spin state
         self.herald_projectors: List[nq.NQobj] = []  # heralding operator
 
+        # Alternative to herald_projectors: detectors of the photonic modes and the click patterns of every branch
+        self.detectors: Optional[dict] = None
+        self.herald_patterns: Optional[List[List[dict]]] = None
+        # Outcome distribution and conditional spin states of every click pattern, see compute_click_statistics
+        self.click_statistics: Optional[det.ClickStatistics] = None
+
         # Fidelity to be calculated
         self.fidelity: Optional[list] = None
         self.fidelity_total: Optional[float] = None
@@ -73,6 +113,22 @@ class Protocol:
         self.rate: Optional[list] = None
         self.rate_total: Optional[float] = None
 
+        # Automatic truncation of the photonic modes, enabled by an error budget in the parameters
+        self.truncation: Optional[TruncationManager] = None
+        self.truncation_error: Optional[float] = None
+        if parameters.get("truncation_budget") is not None:
+            self.truncation = TruncationManager(parameters["truncation_budget"], max_dim=self.dim)
+
+        # Removal of small matrix elements after every LBB, enabled by an error budget in the parameters
+        self.sparsification: Optional[SparsificationManager] = None
+        self.sparsification_error: Optional[float] = None
+        self.sparsification_nnz_reduction: Optional[float] = None
+        if parameters.get("sparsification_budget") is not None:
+            self.sparsification = SparsificationManager(parameters["sparsification_budget"])
+
+        # Heralded process map from the spin input to every branch, see compute_process_map
+        self.process_map: Optional[dict] = None
+
     def run(self):
         """
         Execute the protocol sequence.
@@ -83,10 +139,45 @@ class Protocol:
             Tuple containing fidelity and rate of the protocol.
         """
         self.dm = self.dm_init
+        self._reset_error_tracking()
         self.protocol_sequence()
         fidelity, rate = self.herald()
+        self._store_error_tracking()
         return fidelity, rate
 
+    def estimate_rate(self):
+        """
+        Compute only the rate of the protocol, which is somewhat cheaper than run.
+
+        The sequence is run on dm_init with the coherences between the spin states removed, and the rate of
+        every branch is computed from the diagonal of the final density matrix, without heralding the spin state.
+        This gives the exact rate as long as the spin coherences do not change photon populations, which holds
+        for all LBBs in LBB.py (spin operations are conditioned on the spin state or are spin flips).
+
+        The whole sequence is still run, on fewer nonzero elements, so this costs 40% to 85% of run for the
+        tutorial protocols at dim 3 and 4 (the smaller fractions for the larger density matrices).
+
+        Returns:
+        -------
+        float
+            The rate of the protocol, summed over the herald branches.
+        """
+        names = [list(names) for names in self.dm_init.names]
+        self.dm = nq.NQobj(np.diag(self.dm_init.diag()), dims=self.dm_init.dims, names=names, kind="state")
+        self._reset_error_tracking()
+        self.protocol_sequence()
+        self._store_error_tracking()
+
+        if self.detectors is not None:
+            statistics = det.click_statistics(self.dm, self.detectors)
+            return sum(np.real(statistics.herald(patterns).tr()) for patterns in self.herald_patterns)
+        rate = 0
+        for herald_projector in self.herald_projectors:
+            if self.truncation is not None:
+                herald_projector = self.truncation.fit(herald_projector, self.dm)
+            rate += _herald_probability(self.dm, herald_projector)
+        return rate
+
     def protocol_sequence(self):
         """
         Defines the protocol sequence. To be implemented in subclasses.
@@ -106,7 +197,29 @@ class Protocol:
         """
         kwargs.update(self.parameters)
 
-        self.dm = LBB(dm_in=self.dm, **kwargs)
+        if self.truncation is not None:
+            self.dm = self.truncation.apply(LBB, self.dm, **kwargs)
+        else:
+            self.dm = LBB(dm_in=self.dm, **kwargs)
+
+        # The heralded spin states are small and every branch should get the same budget, so they are kept as is.
+        if self.sparsification is not None and LBB is not lbb.herald:
+            self.dm = self.sparsification.apply(self.dm)
+
+    def _reset_error_tracking(self):
+        """Reset the errors of truncation and sparsification, before a new run of the protocol sequence."""
+        if self.truncation is not None:
+            self.truncation.reset()
+        if self.sparsification is not None:
+            self.sparsification.reset()
+
+    def _store_error_tracking(self):
+        """Store the accumulated errors of truncation and sparsification."""
+        if self.truncation is not None:
+            self.truncation_error = self.truncation.error
+        if self.sparsification is not None:
+            self.sparsification_error = self.sparsification.error
+            self.sparsification_nnz_reduction = self.sparsification.nnz_reduction
 
     def do_lbb_on_photons(self, LBB, photon_names, **kwargs):
         """
@@ -137,31 +250,98 @@ class Protocol:
             A tuple containing the fidelity and rate after heralding.
         """
 
+        return self.evaluate_branches(self.herald_branches())
+
+    def herald_branches(self):
+        """
+        Apply every herald projector to the current density matrix.
+        If detectors are given, the branches are computed from the click statistics of the detectors instead.
+
+        Returns:
+        -------
+        list of NQobj
+            Unnormalized heralded spin density matrix of every branch.
+        """
+
+        if self.detectors is not None:
+            statistics = self.compute_click_statistics()
+            return [statistics.herald(patterns) for patterns in self.herald_patterns]
+
         # Create a copy of the current density matrix
         dm = copy(self.dm)
 
-        # Initialize lists to store fidelity, rate, and heralded density matrices
-        fidelity = []
-        rate = []
         dm_heralded = []
+        for herald_projector in self.herald_projectors:
 
-        # Iterate over herald projectors and target states
-        for herald_projector, target_state in zip(self.herald_projectors, self.target_states):
+            # Match the dimensions of the projector to the automatically truncated photonic modes
+            if self.truncation is not None:
+                herald_projector = self.truncation.fit(herald_projector, self.dm)
 
             # Apply the herald operation to the density matrix using the given projector
             self.do_lbb(lbb.herald, herald_projector=herald_projector)
 
-            # Calculate the fidelity and rate metrics for the current state
-            metrics = self.metrics(target_state)
-            fidelity.append(metrics[0])
-            rate.append(metrics[1])
-
             # Store the heralded density matrix
             dm_heralded.append(self.dm)
 
             # Reset the density matrix to its original state before the next iteration
             self.dm = copy(dm)
 
+        return dm_heralded
+
+    def compute_click_statistics(self, detectors=None):
+        """
+        Compute the probability and conditional spin state of every click pattern of the current density matrix.
+
+        After run, the current density matrix is the state before heralding, so this gives the statistics of all
+        click patterns in a single pass, e.g. to study other heralding rules than the herald branches.
+
+        Parameters:
+        ----------
+        detectors : dict, optional
+            Detector of every photonic mode. Default is self.detectors, or an ideal threshold detector on every
+            photonic mode if those are not given.
+
+        Returns:
+        -------
+        ClickStatistics
+            The click statistics, also stored in self.click_statistics.
+        """
+        if detectors is None:
+            detectors = self.detectors
+        if detectors is None:
+            detectors = {name: det.ThresholdDetector() for name in det.photonic_modes(self.dm)}
+        self.click_statistics = det.click_statistics(self.dm, detectors)
+        return self.click_statistics
+
+    def evaluate_branches(self, dm_heralded):
+        """
+        Calculate the fidelity and rate of every heralded branch and of the protocol.
+        Updates the instance's fidelity, rate and dm_heralded attributes.
+
+        Parameters:
+        ----------
+        dm_heralded : list of NQobj
+            Unnormalized heralded spin density matrix of every branch.
+
+        Returns:
+        -------
+        tuple
+            A tuple containing the fidelity and rate after heralding.
+        """
+
+        # Initialize lists to store fidelity and rate
+        fidelity = []
+        rate = []
+
+        dm = self.dm
+        for dm_branch, target_state in zip(dm_heralded, self.target_states):
+            # Calculate the fidelity and rate metrics for the heralded state
+            self.dm = dm_branch
+            metrics = self.metrics(target_state)
+            fidelity.append(metrics[0])
+            rate.append(metrics[1])
+        self.dm = dm
+
         # Update class attributes with calculated values
         self.fidelity = fidelity
         self.fidelity_total = np.average(np.array(fidelity), weights=np.array(rate))
@@ -170,6 +350,80 @@ class Protocol:
         self.dm_heralded = dm_heralded
         return self.fidelity_total, self.rate_total
 
+    def compute_process_map(self):
+        """
+        Compute the heralded process map from the spin input state to the spin output of every branch.
+
+        The protocol is linear in dm_init, so the map follows from running the protocol sequence on the
+        basis elements |i><j| of the spin space of dm_init. Only i <= j is run, as the output of |j><i| is
+        the adjoint of the output of |i><j|. The map is stored in process_map and can be applied to any
+        dm_init with apply_process_map, as long as the parameters that are not used by dm_init are the same.
+
+        Returns:
+        -------
+        dict
+            maps : np.ndarray of shape (branch, d**2, d**2), mapping the flattened input to the flattened output.
+            names, dims : names and dims of the spins (sorted by name) of both input and output.
+        """
+        names = sorted(self.dm_init.names[0])
+        dims = self.dm_init.permute(names).dims[0]
+        d = int(np.prod(dims))
+        maps = np.zeros((len(self.target_states), d * d, d * d), dtype=complex)
+
+        self._reset_error_tracking()
+        for i in range(d):
+            for j in range(i, d):
+                basis_element = np.zeros((d, d), dtype=complex)
+                basis_element[i, j] = 1
+                self.dm = nq.NQobj(basis_element, dims=[dims, dims], names=names, kind="state")
+                self.protocol_sequence()
+                for branch, dm_branch in enumerate(self.herald_branches()):
+                    output = dm_branch.permute(names).full()
+                    maps[branch, :, i * d + j] = output.ravel()
+                    maps[branch, :, j * d + i] = output.conj().T.ravel()
+
+        self._store_error_tracking()
+        self.process_map = {"maps": maps, "names": names, "dims": dims}
+        return self.process_map
+
+    def apply_process_map(self, dm_init=None):
+        """
+        Compute the heralded spin density matrices by applying the process map to an initial spin state.
+
+        Parameters:
+        ----------
+        dm_init : NQobj, optional
+            Initial spin state. Default is self.dm_init.
+
+        Returns:
+        -------
+        list of NQobj
+            Unnormalized heralded spin density matrix of every branch.
+        """
+        if self.process_map is None:
+            self.compute_process_map()
+        if dm_init is None:
+            dm_init = self.dm_init
+        names = self.process_map["names"]
+        dims = self.process_map["dims"]
+        d = int(np.prod(dims))
+
+        outputs = self.process_map["maps"] @ dm_init.permute(names).full().ravel()
+        return [
+            nq.NQobj(output.reshape(d, d), dims=[dims, dims], names=list(names), kind="state") for output in outputs
+        ]
+
+    def run_process_map(self):
+        """
+        Execute the protocol through its process map, computing the map first if it is not present.
+
+        Returns:
+        -------
+        tuple
+            Tuple containing fidelity and rate of the protocol.
+        """
+        return self.evaluate_branches(self.apply_process_map())
+
     def metrics(self, target_state):
         """
         Calculate the fidelity and success probability of the current density matrix for a given target spin state.
@@ -195,9 +449,102 @@ class Protocol:
         return fidelity, rate
 
 
+def _timed_call(function, *args):
+    """Call function and return its result with the CPU time of the calling thread."""
+    time_start = time.thread_time()
+    result = function(*args)
+    return result, time.thread_time() - time_start
+
+
+def _serial_call(timed, arguments, done, index):
+    """Run a timed call in this process, store its result and CPU time in done and return its wall and CPU time."""
+    time_start = time.time()
+    done[index] = timed(*arguments)
+    return time.time() - time_start, done[index][1]
+
+
+def _serial_time(serial, cpu_time):
+    """
+    Estimated wall time of a serial run of calls with a total CPU time, from the wall and CPU time of the calls
+    that ran serially. Their ratio accounts for time outside the CPU time of the calling thread, e.g. BLAS threads
+    or I/O, and scaling the CPU time of all calls accounts for calls of different cost.
+    """
+    wall_serial = sum(wall for wall, _ in serial)
+    cpu_serial = sum(cpu for _, cpu in serial)
+    return cpu_time * wall_serial / cpu_serial if cpu_serial > 0 else wall_serial
+
+
+def _limit_blas_threads(blas_threads):
+    """Limit the number of BLAS threads of the current process, used as initializer of the workers."""
+    if threadpool_limits is not None and blas_threads is not None:
+        threadpool_limits(limits=blas_threads)
+
+
+def _check_blas_threads(blas_threads):
+    """Warn that a limit of the BLAS threads has no effect without threadpoolctl."""
+    if threadpool_limits is None and blas_threads is not None:
+        warnings.warn("threadpoolctl is not installed, the number of BLAS threads is not limited.")
+
+
+def _initialize_worker(blas_threads, bank_name):
+    """Initializer of the process workers: limit the BLAS threads and attach the published operator bank."""
+    _limit_blas_threads(blas_threads)
+    ob.attach(bank_name)
+
+
+def _blas_thread_limit(blas_threads):
+    """Context in which the number of BLAS threads is limited, shared by all threads of the process."""
+    if threadpool_limits is None or blas_threads is None:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=blas_threads)
+
+
+def _choose_backend(time_point, thread_speedup, time_startup, remaining, workers):
+    """Backend with the lower estimated time for the remaining calls, from the calibration of a sweep."""
+    time_thread = remaining * time_point / thread_speedup
+    time_process = time_startup + remaining * time_point / max(min(workers, remaining), 1)
+    return "thread" if time_thread <= time_process else "process"
+
+
+def _herald_probability(dm, herald_projector):
+    """
+    Probability tr(P dm P) of a herald projector, from the diagonal of dm if the projector is diagonal.
+    """
+    P = herald_projector
+    data = P.data.tocoo()
+    if P.names[0] != P.names[1] or set(P.names[0]) - set(dm.names[0]) or np.any(data.row != data.col):
+        return np.real(dm.conjugate_by(P).tr())
+
+    # Order the modes of the projector as in dm and broadcast its weights over the other modes.
+    weights = (np.abs(P.diag()) ** 2).reshape(P.dims[0])
+    names = [name for name in dm.names[0] if name in P.names[0]]
+    weights = np.transpose(weights, [P.names[0].index(name) for name in names])
+    shape = [dim if name in P.names[0] else 1 for name, dim in zip(dm.names[0], dm.dims[0])]
+    populations = np.real(dm.diag()).reshape(dm.dims[0])
+    return float(np.sum(populations * weights.reshape(shape)))
+
+
 class ProtocolSweep:
     def __init__(
-        self, protocol, parameters, sweep_parameters, save_results=False, save_folder=None, save_name="dataset"
+        self,
+        protocol,
+        parameters,
+        sweep_parameters,
+        save_results=False,
+        save_folder=None,
+        save_name="dataset",
+        cache: Optional[ResultCache] = None,
+        store_dm_heralded=False,
+        initial_state_parameters=None,
+        store_click_statistics=False,
+        sampling=None,
+        number_of_samples=None,
+        seed=None,
+        rate_threshold=None,
+        backend="process",
+        workers=None,
+        blas_threads=1,
+        share_operators=False,
     ):
 
         self.protocol = protocol
@@ -206,6 +553,58 @@ class ProtocolSweep:
         self.save_results = save_results
         self.save_folder = save_folder
         self.save_name = save_name
+        # Optional on-disk cache of results, looked up by the workers before running the protocol.
+        self.cache = cache
+        # Store the fidelity, rate and heralded spin density matrix of every branch in the dataset.
+        self.store_dm_heralded = store_dm_heralded
+        if store_dm_heralded and cache is not None and not cache.store_dm:
+            raise ValueError("store_dm_heralded needs a cache with store_dm=True, or every lookup would miss.")
+        # Swept parameters that only enter dm_init, their points share one process map.
+        self.initial_state_parameters = [
+            name for name in self.sweep_parameters if name in (initial_state_parameters or [])
+        ]
+        # Store the probability and conditional spin state of every click pattern.
+        self.store_click_statistics = store_click_statistics
+        if store_click_statistics and self.initial_state_parameters:
+            raise ValueError("The click statistics can not be computed from a process map.")
+        # With sampling, sweep_parameters holds the (lower, upper) bounds and the points are drawn from a design.
+        self.sampling = sampling
+        self.samples = None
+        if sampling is not None:
+            if self.initial_state_parameters:
+                raise ValueError("A process map can only be shared on a grid, not with sampling.")
+            # Parameters with an integer value, e.g. dim, are sampled as integers.
+            integer_parameters = [
+                name
+                for name in sweep_parameters
+                if isinstance(parameters.get(name), (int, np.integer)) and not isinstance(parameters[name], bool)
+            ]
+            self.samples = sample_parameters(
+                sweep_parameters, sampling, number_of_samples, seed=seed, integer_parameters=integer_parameters
+            )
+        # Points with a rate below the threshold only get their rate computed (Protocol.estimate_rate), fidelity NaN.
+        # Points above it pay for the estimate and the full run, so with an estimate that costs a fraction c of a
+        # run (0.4 to 0.85, see estimate_rate) the sweep is only faster if more than a fraction c of its points are
+        # pruned, e.g. at least 85% for ProtocolA at dim 3 and 45% for ProtocolB at dim 4.
+        self.rate_threshold = rate_threshold
+        stores_branches = store_dm_heralded or store_click_statistics
+        if rate_threshold is not None and (stores_branches or self.initial_state_parameters):
+            raise ValueError("A rate_threshold can not be combined with stored branches or a process map.")
+        # Parallel execution: "process", "thread" or "auto" (chosen by timing the first points).
+        if backend not in ("process", "thread", "auto"):
+            raise ValueError("backend should be process, thread or auto")
+        self.backend = backend
+        self.workers = workers
+        self.blas_threads = blas_threads
+        _check_blas_threads(blas_threads)
+        # Publish the banked operators (see operator_bank.py) of the parent to the process workers in shared memory.
+        self.share_operators = share_operators
+        # Backend used by the last sweep, its speedup against serial execution, parallel efficiency and
+        # load-imbalance tail, see starmap.
+        self.sweep_backend = None
+        self.speedup = None
+        self.parallel_efficiency = None
+        self.tail_time = None
         if save_results:
             if save_folder is None or save_name is None:
                 raise ValueError("If save_result is True, save_folder and save_name can't be None.")
@@ -216,50 +615,354 @@ class ProtocolSweep:
         parameters = copy(self.parameters)
         update_parameters = dict(zip(sweep_parameter_names, args))
         parameters.update(update_parameters)
-        protocol = self.protocol(parameters=parameters)
-        return protocol.run()
+
+        entry = None
+        if self.cache is not None:
+            key = self.cache.key(self.protocol, parameters)
+            entry = self.cache.get(
+                key, need_dm=self.store_dm_heralded, need_click_statistics=self.store_click_statistics
+            )
+
+        if entry is None:
+            protocol = self.protocol(parameters=parameters)
+            if self.rate_threshold is not None:
+                rate = protocol.estimate_rate()
+                if rate < self.rate_threshold:
+                    # Pruned points are not cached, as their fidelity is not computed.
+                    return self._entry_result(
+                        {
+                            "fidelity": np.nan,
+                            "rate": rate,
+                            "truncation_error": protocol.truncation_error,
+                            "sparsification_error": protocol.sparsification_error,
+                        }
+                    )
+            protocol.run()
+            if self.store_click_statistics and protocol.click_statistics is None:
+                protocol.compute_click_statistics()
+            entry = self._protocol_entry(protocol)
+            if self.cache is not None:
+                self.cache.put(key, entry)
+        return self._entry_result(entry)
+
+    def update_parameters_and_run_process_map(self, outer_names, inner_names, inner_values, *args):
+        """Run all initial state points for one value of the other swept parameters, sharing one process map."""
+        parameters = copy(self.parameters)
+        parameters.update(dict(zip(outer_names, args)))
+
+        process_map = None
+        results = []
+        for values in inner_values:
+            point_parameters = dict(parameters, **dict(zip(inner_names, values)))
+            entry = None
+            if self.cache is not None:
+                key = self.cache.key(self.protocol, point_parameters)
+                entry = self.cache.get(key, need_dm=self.store_dm_heralded)
+
+            if entry is None:
+                protocol = self.protocol(parameters=point_parameters)
+                if process_map is None:
+                    process_map = protocol.compute_process_map()
+                    truncation_error = protocol.truncation_error
+                    sparsification_error = protocol.sparsification_error
+                else:
+                    protocol.process_map = process_map
+                    protocol.truncation_error = truncation_error
+                    protocol.sparsification_error = sparsification_error
+                protocol.run_process_map()
+                entry = self._protocol_entry(protocol)
+                if self.cache is not None:
+                    self.cache.put(key, entry)
+            results.append(self._entry_result(entry))
+        return results
+
+    def _protocol_entry(self, protocol):
+        return {
+            "fidelity": protocol.fidelity_total,
+            "rate": protocol.rate_total,
+            "fidelity_branch": protocol.fidelity,
+            "rate_branch": protocol.rate,
+            "dm_heralded": protocol.dm_heralded,
+            "truncation_error": protocol.truncation_error,
+            "sparsification_error": protocol.sparsification_error,
+            "click_statistics": protocol.click_statistics,
+        }
+
+    def _entry_result(self, entry):
+        result = {"fidelity": entry["fidelity"], "rate": entry["rate"]}
+        if entry.get("truncation_error") is not None:
+            result["truncation_error"] = entry["truncation_error"]
+        if entry.get("sparsification_error") is not None:
+            result["sparsification_error"] = entry["sparsification_error"]
+        if self.store_dm_heralded:
+            result["fidelity_branch"] = entry["fidelity_branch"]
+            result["rate_branch"] = entry["rate_branch"]
+            result["dm_heralded"] = pack_dm_heralded(entry["dm_heralded"])
+        if self.store_click_statistics:
+            result["click_statistics"] = entry["click_statistics"]
+        return result
 
     def multiprocess_sweep(self):
+        function, arguments = self.sweep_calls()
+        time_start = time.time()
+        results = self.starmap(function, arguments, cost_keys=self.sweep_cost_keys(arguments))
+        time_sim = time.time() - time_start
+        print(
+            f"Sweep time with {self.sweep_backend} was {time_sim:.3f} s, speedup {self.speedup:.1f}x against "
+            f"serial, parallel efficiency {self.parallel_efficiency:.0%}, load-imbalance tail {self.tail_time:.3f} s"
+        )
+        return self.sweep_data_vars(results)
+
+    def sweep_calls(self):
+        """
+        The independent calls of the sweep, which can be run in any order and on any pool.
+
+        Returns:
+        -------
+        tuple
+            Function and a list with the arguments of every call. The return values of the calls, in the order
+            of the arguments, are turned into the data variables of the dataset by sweep_data_vars.
+        """
+        sweep_parameter_names = list(self.sweep_parameters.keys())
+        if self.initial_state_parameters:
+            # One call per value of the other swept parameters, which runs all initial states with one process map.
+            inner_names = self.initial_state_parameters
+            outer_names = [name for name in sweep_parameter_names if name not in inner_names]
+            inner_values = list(itertools.product(*[list(self.sweep_parameters[name]) for name in inner_names]))
+            outer_values = itertools.product(*[list(self.sweep_parameters[name]) for name in outer_names])
+            function = functools.partial(
+                self.update_parameters_and_run_process_map, outer_names, inner_names, inner_values
+            )
+            return function, list(outer_values)
+
+        function = functools.partial(self.update_parameters_and_run, sweep_parameter_names)
+        if self.samples is not None:
+            # Unstructured sweep: every point is a sample.
+            return function, list(zip(*[self.samples[name] for name in sweep_parameter_names]))
+        return function, list(itertools.product(*[list(array) for array in self.sweep_parameters.values()]))
+
+    def sweep_cost_keys(self, arguments):
+        """
+        Cost key of every call of sweep_calls: the values of the swept parameters in COST_PARAMETERS, which change
+        the size of a run, while the other parameters only change the numbers. See CostScheduler.
+        """
+        names = [name for name in self.sweep_parameters if name not in self.initial_state_parameters]
+        positions = [i for i, name in enumerate(names) if name in COST_PARAMETERS]
+        return [tuple(values[i] for i in positions) for values in arguments]
+
+    def sweep_data_vars(self, results):
+        """
+        Data variables of the dataset from the return values of the calls of sweep_calls.
+
+        Parameters:
+        ----------
+        results : list
+            Return values of the calls, in the order of their arguments.
+
+        Returns:
+        -------
+        dict
+            Data variables of the sweep dataset.
+        """
+        sweep_parameter_names = list(self.sweep_parameters.keys())
+        if self.samples is not None:
+            dims = ["sample"]
+            data_array_size = [len(self.samples[sweep_parameter_names[0]])]
+        else:
+            dims = sweep_parameter_names
+            data_array_size = [len(parameter_list) for parameter_list in self.sweep_parameters.values()]
+        if self.initial_state_parameters:
+            results = self._order_process_map_results(results)
+
+        fidelity = np.array([x["fidelity"] for x in results]).reshape(data_array_size)
+        rate = np.array([x["rate"] for x in results]).reshape(data_array_size)
+        data_vars = {"fidelity": (dims, fidelity), "rate": (dims, rate)}
+
+        if "truncation_error" in results[0]:
+            truncation_error = np.array([x["truncation_error"] for x in results]).reshape(data_array_size)
+            data_vars["truncation_error"] = (dims, truncation_error)
+
+        if "sparsification_error" in results[0]:
+            sparsification_error = np.array([x["sparsification_error"] for x in results]).reshape(data_array_size)
+            data_vars["sparsification_error"] = (dims, sparsification_error)
+
+        if self.store_dm_heralded:
+            branch_dims = dims + ["branch"]
+            fidelity_branch = np.array([x["fidelity_branch"] for x in results]).reshape(data_array_size + [-1])
+            rate_branch = np.array([x["rate_branch"] for x in results]).reshape(data_array_size + [-1])
+            dm_packed = np.array([x["dm_heralded"][0] for x in results])
+            dm_packed = dm_packed.reshape(data_array_size + list(dm_packed.shape[1:]))
+            # The names and dims of the spins are needed to rebuild the NQobj, see get_dm_heralded.
+            dm_attrs = {"names": results[0]["dm_heralded"][1], "dims": results[0]["dm_heralded"][2]}
+            data_vars["fidelity_branch"] = (branch_dims, fidelity_branch)
+            data_vars["rate_branch"] = (branch_dims, rate_branch)
+            data_vars["dm_heralded"] = (branch_dims + ["dm_element"], dm_packed, dm_attrs)
+
+        if self.store_click_statistics:
+            statistics = [x["click_statistics"] for x in results]
+            data_vars.update(_click_statistics_data_vars(statistics, dims, data_array_size))
+
+        return data_vars
+
+    def _order_process_map_results(self, results):
+        """Flatten the results of the process map calls and reorder them to the order of sweep_parameters."""
         sweep_parameter_names = list(self.sweep_parameters.keys())
-        wrap = functools.partial(self.update_parameters_and_run, sweep_parameter_names)
+        inner_names = self.initial_state_parameters
+        outer_names = [name for name in sweep_parameter_names if name not in inner_names]
+        results = list(itertools.chain.from_iterable(results))
 
-        parameter_lists = list(self.sweep_parameters.values())
-        data_array_size = [len(parameter_list) for parameter_list in parameter_lists]
-        parameter_values_iter = itertools.product(*[list(array) for array in parameter_lists])
+        # The results are ordered as outer_names + inner_names.
+        names = outer_names + inner_names
+        order = np.arange(len(results)).reshape([len(self.sweep_parameters[name]) for name in names])
+        order = order.transpose([names.index(name) for name in sweep_parameter_names]).ravel()
+        return [results[i] for i in order]
+
+    def starmap(self, function, arguments, cost_keys=None):
+        """
+        Call function for every tuple of arguments in parallel, with the backend of the sweep.
+
+        Threads share the in-process caches (e.g. the memoized operators of LBB.py) and avoid starting and
+        importing in new processes, processes avoid the GIL for the parts that run in Python. With backend "auto"
+        the first points are timed serially and on a thread pool, and the startup of the process pool is timed, to
+        choose between them; a started process pool is used for the sweep.
+
+        At least one call runs serially in this process (the first one, or the calibration and shared-operator
+        calls). Its wall time per CPU time, times the CPU time of all calls, estimates the time of a serial sweep,
+        and that divided by the wall time of the sweep is stored in self.speedup. The parallel efficiency, the
+        CPU time of all calls divided by the wall time and the number of workers, is stored in
+        self.parallel_efficiency.
+
+        The calls are distributed by a CostScheduler: the most expensive calls first, in batches that shrink
+        towards the end, such that the workers finish at about the same time. The time between the first and
+        the last worker finishing is stored in self.tail_time.
+
+        With share_operators and the process backend, one call of every cost group runs in this process first,
+        and the operators it banked are published in shared memory, which the workers use without copy.
+
+        Parameters:
+        ----------
+        function : function
+            Function to call, it has to be picklable for the process backend.
+        arguments : iterable of tuple
+            Arguments of every call.
+        cost_keys : list, optional
+            Cost key of every call, calls with the same key are assumed to cost the same. Default is the same
+            key for all calls.
+
+        Returns:
+        -------
+        list
+            Return values of all calls, in the order of arguments.
+        """
+        arguments = list(arguments)
+        cost_keys = [None] * len(arguments) if cost_keys is None else list(cost_keys)
+        timed = functools.partial(_timed_call, function)
+        workers = self.workers or os.cpu_count()
 
         time_start = time.time()
-        with multi.Pool() as processing_pool:
-            results = processing_pool.starmap(wrap, parameter_values_iter)
-        time_sim = time.time() - time_start
-        print(f"Sweep time with multi was {time_sim:.3f} s")
+        backend = self.backend
+        done = {}
+        # Wall and CPU time of the calls that run serially in this process.
+        serial = []
+        if backend == "auto":
+            time_point, thread_speedup, calibrated = self._calibrate_threads(timed, arguments, workers)
+            done.update(enumerate(calibrated))
+            serial.append((time_point, calibrated[0][1]))
+            if thread_speedup is None:
+                backend = "thread"
+        if backend != "thread" and self.share_operators:
+            # Run one call per cost group here, such that the banked operators of every group can be published.
+            for key in dict.fromkeys(cost_keys):
+                indices = [i for i, other in enumerate(cost_keys) if other == key]
+                if not any(i in done for i in indices):
+                    serial.append(_serial_call(timed, arguments[indices[0]], done, indices[0]))
+        if not serial and arguments:
+            serial.append(_serial_call(timed, arguments[0], done, 0))
+        pending = [i for i in range(len(arguments)) if i not in done]
+        calls = [(function, arguments[i]) for i in pending]
+        pending_keys = [cost_keys[i] for i in pending]
+        if backend == "auto" and not calls:
+            backend = "thread"  # The calibration ran all calls.
+        scheduler = CostScheduler(workers)
+        results = []
+        with contextlib.ExitStack() as stack:
+            pool = None
+            if calls and backend != "thread":
+                bank = ob.published_operators() if self.share_operators else contextlib.nullcontext()
+                bank_name = stack.enter_context(bank)
+                time_startup = time.time()
+                pool = stack.enter_context(
+                    multi.Pool(workers, initializer=_initialize_worker, initargs=(self.blas_threads, bank_name))
+                )
+                if backend == "auto":
+                    # The startup of the pool is timed once all workers run, the pool is kept for the sweep.
+                    pool.starmap(os.getpid, [()] * workers)
+                    time_startup = time.time() - time_startup
+                    backend = _choose_backend(time_point, thread_speedup, time_startup, len(calls), workers)
+                    if backend == "thread":
+                        pool.terminate()
+            if calls and backend == "thread":
+                stack.enter_context(_blas_thread_limit(self.blas_threads))
+                pool = stack.enter_context(ThreadPool(workers))
+            if calls:
+                results = scheduler.run(pool, calls, pending_keys)
+        time_wall = time.time() - time_start
 
-        fidelity = np.array([x[0] for x in results]).reshape(data_array_size)
-        rate = np.array([x[1] for x in results]).reshape(data_array_size)
+        self.sweep_backend = backend
+        self.tail_time = scheduler.tail_time
+        cpu_time = sum(cpu_time for _, cpu_time in done.values()) + sum(scheduler.cpu_times)
+        self.speedup = _serial_time(serial, cpu_time) / time_wall if time_wall > 0 else np.nan
+        self.parallel_efficiency = cpu_time / (time_wall * workers) if time_wall > 0 else np.nan
+        done.update((i, (result, None)) for i, result in zip(pending, results))
+        return [done[i][0] for i in range(len(arguments))]
 
-        return fidelity, rate
+    def _calibrate_threads(self, timed, arguments, workers):
+        """
+        Time a serial call and a batch of calls on threads, for the choice between threads and processes.
+
+        Returns the time of the serial call, the speedup of the thread pool against serial execution (None if
+        there is nothing to choose, with a single worker or call) and the results of the calls.
+        """
+        time_start = time.time()
+        results = [timed(*arguments[0])]
+        time_point = time.time() - time_start
+        if workers == 1 or len(arguments) == 1:
+            return time_point, None, results
+
+        batch = arguments[1 : 1 + workers]
+        time_start = time.time()
+        with _blas_thread_limit(self.blas_threads), ThreadPool(workers) as pool:
+            results += pool.starmap(timed, batch)
+        thread_speedup = len(batch) * time_point / (time.time() - time_start)
+        return time_point, thread_speedup, results
 
     def run(self):
-        sweep_parameter_names = list(self.sweep_parameters.keys())
-        fidelity, rate = self.multiprocess_sweep()
-        data_vars = {"fidelity": (sweep_parameter_names, fidelity), "rate": (sweep_parameter_names, rate)}
+        self.complete_run(self.multiprocess_sweep())
+
+    def complete_run(self, data_vars):
+        """Build the dataset from the data variables of the sweep and save it."""
+        if self.cache is not None:
+            self.cache.evict()
         parameters = copy(self.parameters)
         for parameter in self.sweep_parameters:
             parameters.pop(parameter)
-        self.dataset = xr.Dataset(data_vars, self.sweep_parameters, attrs=parameters)
+        if self.samples is not None:
+            coords = {name: ("sample", values) for name, values in self.samples.items()}
+        else:
+            coords = self.sweep_parameters
+        self.dataset = xr.Dataset(data_vars, coords, attrs=parameters)
         if self.save_results:
             self.save_dataset()
 
     def save_dataset(self):
         date_time = self._generate_date_time()
         file_path = join(self.save_folder, date_time + self.save_name + ".hdf5")
-        # Invalid_netcdf is used to be able to save None and bools as attrs
-        self.dataset.to_netcdf(file_path, engine="h5netcdf", invalid_netcdf=True)
+        write_dataset(self.dataset, file_path)
 
     def save_dataset_fidelity_rate(self):
         date_time = self._generate_date_time()
         file_path = join(self.save_folder, f"{date_time}{self.save_name}_fidelity_rate.hdf5")
-        # Invalid_netcdf is used to be able to save None and bools as attrs
-        self.dataset_fidelity_rate.to_netcdf(file_path, engine="h5netcdf", invalid_netcdf=True)
+        write_dataset(self.dataset_fidelity_rate, file_path)
 
     def _generate_date_time(self):
         time_stamp = datetime.datetime.now()
@@ -277,6 +980,8 @@ class ProtocolSweep:
         time_start = time.time()
         protocol.run()
         time_single = time.time() - time_start
+        if self.samples is not None:
+            return time_single * len(next(iter(self.samples.values())))
         par_dimensions = [len(sweep) for sweep in self.sweep_parameters.values()]
         return time_single * np.prod(par_dimensions)
 
@@ -308,5 +1013,301 @@ class ProtocolSweep:
         self.dataset_fidelity_rate = xr.combine_by_coords(fidelities).assign_attrs(self.dataset.attrs)
 
 
+def sample_parameters(bounds, sampling, number_of_samples, seed=None, integer_parameters=None):
+    """
+    Draw points of a sampling sweep within bounds.
+
+    Parameters:
+    ----------
+    bounds : dict
+        Lower and upper bound of every parameter.
+    sampling : str
+        Design of the points: "sobol" (scrambled Sobol sequence), "latin_hypercube" or "random".
+    number_of_samples : int
+        Number of points. Sobol sequences are balanced for powers of two.
+    seed : int, optional
+        Seed of the design. Default is None.
+    integer_parameters : list of str, optional
+        Parameters with integer values, e.g. dim. They get the integers from lower to upper, both included, with
+        equal probability. Default is None.
+
+    Returns:
+    -------
+    dict
+        Array with the values at every point for every parameter.
+    """
+    from scipy.stats import qmc  # pylint: disable=import-outside-toplevel
+
+    if number_of_samples is None:
+        raise ValueError("number_of_samples is needed for a sampling sweep.")
+    lower = np.array([bound[0] for bound in bounds.values()], dtype=float)
+    upper = np.array([bound[-1] for bound in bounds.values()], dtype=float)
+    if sampling == "sobol":
+        unit = qmc.Sobol(len(bounds), scramble=True, seed=seed).random(number_of_samples)
+    elif sampling == "latin_hypercube":
+        unit = qmc.LatinHypercube(len(bounds), seed=seed).random(number_of_samples)
+    elif sampling == "random":
+        unit = np.random.default_rng(seed).uniform(size=(number_of_samples, len(bounds)))
+    else:
+        raise ValueError("sampling should be sobol, latin_hypercube or random")
+    samples = {}
+    for i, name in enumerate(bounds):
+        if name in (integer_parameters or []):
+            # Every integer gets an equal share of the unit interval, such that the design stays balanced.
+            values = np.floor(lower[i] + unit[:, i] * (upper[i] - lower[i] + 1))
+            samples[name] = np.minimum(values, upper[i]).astype(int)
+        else:
+            samples[name] = lower[i] + unit[:, i] * (upper[i] - lower[i])
+    return samples
+
+
+def pack_hermitian(matrix):
+    """
+    Pack Hermitian matrices into real arrays of the diagonal and the upper triangle.
+
+    Parameters:
+    ----------
+    matrix : np.ndarray
+        Array of shape (..., d, d) with Hermitian matrices in the last two axes.
+
+    Returns:
+    -------
+    np.ndarray
+        Real array of shape (..., d**2) with the diagonal, the real parts and the imaginary parts
+        of the strict upper triangle.
+    """
+    d = matrix.shape[-1]
+    rows, cols = np.triu_indices(d, k=1)
+    upper = matrix[..., rows, cols]
+    diagonal = np.diagonal(matrix, axis1=-2, axis2=-1)
+    return np.concatenate([diagonal.real, upper.real, upper.imag], axis=-1)
+
+
+def unpack_hermitian(packed):
+    """
+    Rebuild Hermitian matrices from the real arrays made by pack_hermitian.
+
+    Parameters:
+    ----------
+    packed : np.ndarray
+        Real array of shape (..., d**2).
+
+    Returns:
+    -------
+    np.ndarray
+        Complex array of shape (..., d, d).
+    """
+    packed = np.asarray(packed)
+    d = int(round(np.sqrt(packed.shape[-1])))
+    n_upper = d * (d - 1) // 2
+    rows, cols = np.triu_indices(d, k=1)
+    upper = packed[..., d : d + n_upper] + 1j * packed[..., d + n_upper :]
+
+    matrix = np.zeros(packed.shape[:-1] + (d, d), dtype=complex)
+    matrix[..., np.arange(d), np.arange(d)] = packed[..., :d]
+    matrix[..., rows, cols] = upper
+    matrix[..., cols, rows] = upper.conj()
+    return matrix
+
+
+def pack_dm_heralded(dm_heralded):
+    """
+    Pack the heralded spin density matrices of all branches of a protocol.
+
+    Parameters:
+    ----------
+    dm_heralded : list of NQobj
+        Heralded (unnormalized) spin density matrices, as in Protocol.dm_heralded.
+
+    Returns:
+    -------
+    tuple
+        Real array of shape (branch, d**2) (see pack_hermitian), the names of the spins and their dims.
+        The spins are sorted by name such that all sweep points share the same order.
+    """
+    names = sorted(dm_heralded[0].names[0])
+    dms = [dm.permute(names) for dm in dm_heralded]
+    packed = pack_hermitian(np.array([dm.full() for dm in dms]))
+    return packed, names, dms[0].dims[0]
+
+
+def get_dm_heralded(dataset, **indexers):
+    """
+    Rebuild heralded spin density matrices of a single sweep point from a dataset.
+
+    Parameters:
+    ----------
+    dataset : xr.Dataset
+        Dataset of a ProtocolSweep with store_dm_heralded=True.
+    **indexers :
+        Values of all sweep parameters (as for dataset.sel) and optionally branch (as position).
+
+    Returns:
+    -------
+    NQobj or list of NQobj
+        The unnormalized heralded density matrix if branch is given, else a list with one per branch.
+    """
+    branch = indexers.pop("branch", None)
+    packed = dataset.dm_heralded.sel(**indexers)
+    if branch is not None:
+        packed = packed.isel(branch=branch)
+    if set(packed.dims) - {"branch", "dm_element"}:
+        raise ValueError("Select a single value for every sweep parameter.")
+
+    names = list(packed.attrs["names"])
+    dims = [int(dim) for dim in packed.attrs["dims"]]
+    matrices = unpack_hermitian(packed.values)
+    if branch is not None:
+        return nq.NQobj(matrices, dims=[dims, dims], names=names, kind="state")
+    return [nq.NQobj(matrix, dims=[dims, dims], names=names, kind="state") for matrix in matrices]
+
+
+def map_dm_heralded(dataset, metric):
+    """
+    Compute a new figure of merit from the heralded spin density matrices stored in a dataset.
+
+    The NQobj are rebuilt one at a time, such that only a single density matrix is kept in memory.
+    For metrics that can be vectorized, unpack_hermitian(dataset.dm_heralded.values) is faster.
+
+    Parameters:
+    ----------
+    dataset : xr.Dataset
+        Dataset of a ProtocolSweep with store_dm_heralded=True.
+    metric : function
+        Function taking an unnormalized heralded NQobj and returning a number.
+
+    Returns:
+    -------
+    xr.DataArray
+        The metric for every sweep point and branch.
+    """
+    packed = dataset.dm_heralded
+    names = list(packed.attrs["names"])
+    dims = [int(dim) for dim in packed.attrs["dims"]]
+    values = packed.values
+    result = np.empty(values.shape[:-1], dtype=object)
+    for index in np.ndindex(*values.shape[:-1]):
+        matrix = unpack_hermitian(values[index])
+        result[index] = metric(nq.NQobj(matrix, dims=[dims, dims], names=names, kind="state"))
+    return xr.DataArray(result.tolist(), coords=packed.isel(dm_element=0, drop=True).coords, dims=packed.dims[:-1])
+
+
+def _click_statistics_data_vars(statistics, sweep_parameter_names, data_array_size):
+    """
+    Data variables with the click probabilities and packed conditional spin states of all sweep points.
+
+    The outcome axes are padded with zeros to the largest number of outcomes, which can differ between sweep
+    points for number resolving detectors with automatic truncation.
+    """
+    modes = statistics[0].modes
+    d = int(np.prod(statistics[0].spin_dims))
+    outcome_shape = np.max([s.dm_spin.shape[:-2] for s in statistics], axis=0)
+
+    packed = []
+    for s in statistics:
+        padding = [(0, n - m) for n, m in zip(outcome_shape, s.dm_spin.shape[:-2])] + [(0, 0)]
+        packed.append(np.pad(pack_hermitian(s.dm_spin), padding))
+    packed = np.array(packed).reshape(data_array_size + list(outcome_shape) + [d * d])
+
+    outcome_dims = sweep_parameter_names + [f"outcome_{mode}" for mode in modes]
+    # The names and dims of the spins are needed to rebuild the NQobj, see get_click_statistics.
+    attrs = {"modes": modes, "names": statistics[0].spin_names, "dims": statistics[0].spin_dims}
+    return {
+        "click_probability": (outcome_dims, packed[..., :d].sum(axis=-1)),
+        "dm_click": (outcome_dims + ["dm_element"], packed, attrs),
+    }
+
+
+def get_click_statistics(dataset, **indexers):
+    """
+    Rebuild the click statistics of a single sweep point from a dataset.
+
+    Parameters:
+    ----------
+    dataset : xr.Dataset
+        Dataset of a ProtocolSweep with store_click_statistics=True.
+    **indexers :
+        Values of all sweep parameters (as for dataset.sel).
+
+    Returns:
+    -------
+    ClickStatistics
+        The click statistics, e.g. to evaluate other heralding rules with ClickStatistics.herald.
+    """
+    packed = dataset.dm_click.sel(**indexers)
+    if len(packed.dims) != len(packed.attrs["modes"]) + 1:
+        raise ValueError("Select a single value for every sweep parameter.")
+    return det.ClickStatistics(
+        list(packed.attrs["modes"]),
+        list(packed.attrs["names"]),
+        [int(dim) for dim in packed.attrs["dims"]],
+        unpack_hermitian(packed.values),
+    )
+
+
+def write_dataset(dataset, file_path, compression_level=4, chunk_bytes=2**20):
+    """
+    Write a sweep dataset to an HDF5 file with chunked and compressed variables.
+
+    The chunks are chosen such that a slice along any sweep axis only reads a small part of the file.
+    The HDF5 filters are transparent for readers, so the files can be read with load_dataset and open_dataset.
+
+    Parameters:
+    ----------
+    dataset : xr.Dataset
+        Dataset to write.
+    file_path : str
+        Path of the file.
+    compression_level : int, optional
+        Level of the gzip compression between 0 and 9. Default is 4.
+    chunk_bytes : int, optional
+        Target size of a single chunk in bytes. Default is 1 MiB.
+    """
+    encoding = {}
+    for name, variable in dataset.variables.items():
+        if variable.ndim == 0 or variable.dtype.kind not in "biufc":
+            continue
+        encoding[name] = {
+            "zlib": True,
+            "complevel": compression_level,
+            "shuffle": True,
+            "chunksizes": _chunk_shape(variable.shape, variable.dtype.itemsize, chunk_bytes),
+        }
+    # Invalid_netcdf is used to be able to save None and bools as attrs
+    dataset.to_netcdf(file_path, engine="h5netcdf", invalid_netcdf=True, encoding=encoding)
+
+
+def _chunk_shape(shape, itemsize, chunk_bytes):
+    """Halve the largest axis of shape until a chunk fits in chunk_bytes."""
+    chunks = list(shape)
+    while np.prod(chunks) * itemsize > chunk_bytes and max(chunks) > 1:
+        axis = int(np.argmax(chunks))
+        chunks[axis] = (chunks[axis] + 1) // 2
+    return tuple(max(chunk, 1) for chunk in chunks)
+
+
 def load_dataset(path):
     return xr.load_dataset(path, engine="h5netcdf")
+
+
+def open_dataset(path, chunks=None):
+    """
+    Open a sweep dataset lazily.
+
+    Only the metadata is read when opening; the data is read when a (slice of a) variable is accessed.
+    With chunks the variables are opened as dask arrays, such that reductions over large sweeps are
+    computed chunk by chunk (this requires dask to be installed).
+
+    Parameters:
+    ----------
+    path : str
+        Path of the file.
+    chunks : dict, str or None, optional
+        Chunks passed to xr.open_dataset, e.g. "auto" or {"delta": 10}. Default is None (no dask).
+
+    Returns:
+    -------
+    xr.Dataset
+        The lazily opened dataset. Close it (or use it as context manager) to release the file.
+    """
+    return xr.open_dataset(path, engine="h5netcdf", chunks=chunks)
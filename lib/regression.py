@@ -0,0 +1,221 @@
+"""
+Regression check against the reference sweeps, run with: python -m lib.regression
+
+The datasets in tutorial_simulations/simulation_datasets were made by the sweeps of the tutorial notebook. The
+protocol follows from the name of a file and its parameters from the attrs and coordinates of the dataset, so
+any subset of the points can be run again. This checks that fidelity and rate still agree with the stored
+values, and that the time and peak memory of a protocol run stay within the budget of the protocol, such that
+performance work on NQobj or the LBBs can not silently change results or slow them down.
+
+The .h5 files in tutorial_simulations/simuation_data are not checked. They hold their base parameters and swept
+values as well, but were made with an older model of the protocols with other parameter names (e.g.
+insertion_efficiency and phase), and the current ProtocolA on midpoint_emission_base gives a fidelity of 0.780
+instead of the stored 0.792 at alpha = 0.1, so they are no reference for the current code.
+
+The protocols are given by the import path of their class, as in the configuration of lib.batch, such that lib
+does not depend on the protocols package.
+"""
+import argparse
+import glob
+import importlib
+import sys
+import time
+import tracemalloc
+from os.path import basename, dirname, join
+
+import numpy as np
+
+import lib.protocol as protocol_module
+
+GOLDEN_FOLDER = join(dirname(dirname(__file__)), "tutorial_simulations", "simulation_datasets")
+
+# Import path of the protocol that made the datasets whose file name contains the key.
+GOLDEN_PROTOCOLS = {
+    "CoopSweepKappa": "protocols.tutorial_protocols.ProtocolC",
+    "CoopSweepG": "protocols.tutorial_protocols.ProtocolC",
+    "ProtocolA": "protocols.tutorial_protocols.ProtocolA",
+    "ProtocolB": "protocols.tutorial_protocols.ProtocolB",
+    "ProtocolC": "protocols.tutorial_protocols.ProtocolC",
+}
+
+# Maximum time in seconds and peak traced memory in bytes of a single protocol run.
+BUDGETS = {
+    "ProtocolA": {"time": 0.25, "memory": 5e6},
+    "ProtocolB": {"time": 0.4, "memory": 8e6},
+    "ProtocolC": {"time": 0.25, "memory": 3e6},
+}
+
+# Tolerances: the fidelity goes through a matrix square root, which amplifies rounding to about 1e-8.
+FIDELITY_TOLERANCE = 1e-5
+RATE_TOLERANCE = 1e-9
+
+
+def golden_files(folder=GOLDEN_FOLDER, protocols=None):
+    """
+    Paths of the reference datasets with a known protocol, without the derived fidelity-rate curves.
+
+    Parameters:
+    ----------
+    folder : str, optional
+        Folder with the reference datasets. Default is GOLDEN_FOLDER.
+    protocols : dict, optional
+        Protocol class or its import path for every part of a file name. Default is GOLDEN_PROTOCOLS.
+
+    Returns:
+    -------
+    list of str
+    """
+    protocols = GOLDEN_PROTOCOLS if protocols is None else protocols
+    return [
+        path
+        for path in sorted(glob.glob(join(folder, "*.hdf5")))
+        if not path.endswith("_fidelity_rate.hdf5") and _protocol_key(path, protocols) is not None
+    ]
+
+
+def golden_points(dataset, points_per_axis=3):
+    """
+    Deterministic subset of the points of a dataset: evenly spaced indices along every axis, including both ends.
+
+    Parameters:
+    ----------
+    dataset : xr.Dataset
+        Dataset of a ProtocolSweep on a grid.
+    points_per_axis : int or None, optional
+        Number of indices per axis. None gives all points. Default is 3.
+
+    Returns:
+    -------
+    list of dict
+        Index of every point along every dimension.
+    """
+    dims = list(dataset.fidelity.dims)
+    indices = []
+    for dim in dims:
+        size = dataset.sizes[dim]
+        if points_per_axis is None or points_per_axis >= size:
+            indices.append(range(size))
+        else:
+            indices.append(np.unique(np.linspace(0, size - 1, points_per_axis).round().astype(int)))
+    grid = np.array(np.meshgrid(*indices, indexing="ij")).reshape(len(dims), -1).T
+    return [dict(zip(dims, (int(i) for i in index))) for index in grid]
+
+
+def check_dataset(path, points_per_axis=3, budgets=None, protocols=None):
+    """
+    Run a subset of the points of a reference dataset again and compare the results and the cost.
+
+    The time is the fastest run of the points, such that a loaded machine does not fail the budget, and the
+    memory is the peak traced memory of the first point (tracemalloc slows down the run, so it is done once).
+
+    Parameters:
+    ----------
+    path : str
+        Path of the reference dataset.
+    points_per_axis : int or None, optional
+        Number of points per axis, see golden_points. Default is 3.
+    budgets : dict, optional
+        Time and memory budget of every protocol. Default is BUDGETS.
+    protocols : dict, optional
+        Protocol class or its import path for every part of a file name. Default is GOLDEN_PROTOCOLS.
+
+    Returns:
+    -------
+    dict
+        points, fidelity (largest absolute difference), rate (largest relative difference), time, memory
+        and ok.
+    """
+    budgets = BUDGETS if budgets is None else budgets
+    protocol_class = _protocol_of(path, GOLDEN_PROTOCOLS if protocols is None else protocols)
+    dataset = protocol_module.load_dataset(path)
+    points = golden_points(dataset, points_per_axis)
+
+    fidelity_difference = 0.0
+    rate_difference = 0.0
+    times = []
+    for index in points:
+        point = dataset.isel(index)
+        protocol = protocol_class(parameters=_parameters(dataset, point, index))
+        time_start = time.perf_counter()
+        fidelity, rate = protocol.run()
+        times.append(time.perf_counter() - time_start)
+        fidelity_difference = max(fidelity_difference, abs(float(np.real(fidelity)) - point.fidelity.item()))
+        rate_scale = max(abs(point.rate.item()), np.finfo(float).tiny)
+        rate_difference = max(rate_difference, abs(float(np.real(rate)) - point.rate.item()) / rate_scale)
+
+    tracemalloc.start()
+    protocol_class(parameters=_parameters(dataset, dataset.isel(points[0]), points[0])).run()
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    budget = budgets[protocol_class.__name__]
+    ok = (
+        fidelity_difference <= FIDELITY_TOLERANCE
+        and rate_difference <= RATE_TOLERANCE
+        and min(times) <= budget["time"]
+        and memory <= budget["memory"]
+    )
+    return {
+        "points": len(points),
+        "fidelity": fidelity_difference,
+        "rate": rate_difference,
+        "time": min(times),
+        "memory": memory,
+        "ok": ok,
+    }
+
+
+def check_golden_datasets(points_per_axis=3, folder=GOLDEN_FOLDER, protocols=None):
+    """
+    Check all reference datasets in folder and print a line per dataset.
+
+    Parameters:
+    ----------
+    points_per_axis : int or None, optional
+        Number of points per axis, see golden_points. Default is 3.
+    folder : str, optional
+        Folder with the reference datasets. Default is GOLDEN_FOLDER.
+    protocols : dict, optional
+        Protocol class or its import path for every part of a file name. Default is GOLDEN_PROTOCOLS.
+
+    Returns:
+    -------
+    bool
+        True if all datasets agree within the tolerances and all protocols are within their budgets.
+    """
+    all_ok = True
+    for path in golden_files(folder, protocols):
+        result = check_dataset(path, points_per_axis=points_per_axis, protocols=protocols)
+        all_ok &= result["ok"]
+        print(
+            f"{basename(path):<45} {result['points']:5d} points  fidelity {result['fidelity']:.1e}  "
+            f"rate {result['rate']:.1e}  {1e3 * result['time']:6.1f} ms  {result['memory'] / 1e6:5.2f} MB  "
+            f"{'ok' if result['ok'] else 'FAIL'}"
+        )
+    return all_ok
+
+
+def _parameters(dataset, point, index):
+    """Parameters of the protocol run of a point: the attrs of the dataset with the swept values of the point."""
+    return dict(dataset.attrs, **{dim: point[dim].item() for dim in index})
+
+
+def _protocol_key(path, protocols):
+    name = basename(path)
+    return next((key for key in protocols if key in name), None)
+
+
+def _protocol_of(path, protocols):
+    protocol = protocols[_protocol_key(path, protocols)]
+    if isinstance(protocol, str):
+        module_name, class_name = protocol.rsplit(".", 1)
+        protocol = getattr(importlib.import_module(module_name), class_name)
+    return protocol
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=3, help="points per axis, 0 for all points")
+    parser.add_argument("--folder", default=GOLDEN_FOLDER, help="folder with the reference datasets")
+    arguments = parser.parse_args()
+    sys.exit(0 if check_golden_datasets(arguments.points or None, arguments.folder) else 1)
@@ -0,0 +1,228 @@
+import contextlib
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import types
+from os.path import dirname, join
+
+import numpy as np
+
+
+class ResultCache:
+    """
+    Persistent on-disk cache of protocol results, shared by all workers of a ProtocolSweep.
+
+    Every entry is content addressed: the key is a hash of the source code of the protocol class,
+    the source code of lib and the exact parameter dict. The value holds the fidelity and rate
+    of every branch and, optionally, the heralded density matrices.
+    Entries are single files that are written atomically, so workers of a pool can read and write
+    the cache concurrently. When the total size exceeds max_size the least recently used entries are evicted,
+    by every process after it wrote a tenth of max_size and at the end of a sweep.
+
+    Attributes:
+            folder : str
+                Folder in which the entries are stored.
+            max_size : int
+                Maximum total size of the cache in bytes. Default is 1 GB.
+            store_dm : bool
+                If True, the heralded density matrices are stored next to the fidelity and rate.
+    """
+
+    extension = ".pkl"
+
+    def __init__(self, folder, max_size=2**30, store_dm=False):
+        """
+        Initialize the ResultCache class.
+
+        Parameters:
+        ----------
+        folder : str
+            Folder in which the entries are stored, it is created if it does not exist.
+        max_size : int, optional
+            Maximum total size of the cache in bytes. Default is 1 GB.
+        store_dm : bool, optional
+            If True, the heralded density matrices are stored as well. Default is False.
+        """
+        self.folder = folder
+        self.max_size = max_size
+        self.store_dm = store_dm
+        # Bytes written by this process since the last eviction.
+        self._written = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, protocol, parameters):
+        """
+        Compute the key of a protocol run.
+
+        Parameters:
+        ----------
+        protocol : subclass of Protocol
+            Protocol class that is run.
+        parameters : dict
+            Parameters the protocol is run with.
+
+        Returns:
+        -------
+        str
+            Hex digest of the key.
+        """
+        source_hash = _protocol_source_hash(protocol)
+        parameters_string = json.dumps(parameters, sort_keys=True, default=_json_default)
+        return hashlib.sha256(f"{source_hash}{_lib_source_hash()}{parameters_string}".encode()).hexdigest()
+
+    def get(self, key, need_dm=False, need_click_statistics=False):
+        """
+        Look up an entry of the cache.
+
+        Parameters:
+        ----------
+        key : str
+            Key of the entry as returned by key.
+        need_dm : bool, optional
+            If True, entries without heralded density matrices are treated as missing. Default is False.
+        need_click_statistics : bool, optional
+            If True, entries without click statistics are treated as missing. Default is False.
+
+        Returns:
+        -------
+        dict or None
+            Dictionary with fidelity, rate, fidelity_branch, rate_branch, dm_heralded and click_statistics,
+            or None if the entry is not present.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if need_dm and (entry.get("dm_heralded") is None or entry.get("rate_branch") is None):
+            return None
+        if need_click_statistics and entry.get("click_statistics") is None:
+            return None
+        try:
+            os.utime(path)  # Mark the entry as recently used for the eviction.
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        """
+        Store the results of a protocol that has been run.
+
+        Parameters:
+        ----------
+        key : str
+            Key of the entry as returned by key.
+        entry : dict
+            Dictionary with fidelity, rate, fidelity_branch, rate_branch and dm_heralded of the protocol.
+            dm_heralded is only stored if store_dm is True.
+        """
+        if not self.store_dm:
+            entry = dict(entry, dm_heralded=None)
+        # Write to a temporary file first and rename it, such that readers never see a partial entry.
+        file = tempfile.NamedTemporaryFile(dir=self.folder, suffix=".tmp", delete=False)
+        try:
+            with file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+                self._written += file.tell()
+            os.replace(file.name, self._path(key))
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(file.name)
+        # Every process evicts after writing a tenth of max_size, such that long sweeps stay within max_size.
+        if self._written > self.max_size / 10:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the size of the cache is below max_size.
+        """
+        self._written = 0
+        entries = []
+        for path in glob.glob(join(self.folder, "*" + self.extension)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        """Remove all entries of the cache."""
+        for path in glob.glob(join(self.folder, "*" + self.extension)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _path(self, key):
+        return join(self.folder, key + self.extension)
+
+
+def _json_default(obj):
+    """Convert numpy types in the parameters to types that json can serialize."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, complex):
+        return [obj.real, obj.imag]
+    raise TypeError(f"Parameter of type {type(obj)} cannot be used in the key of the cache.")
+
+
+@functools.lru_cache(maxsize=None)
+def _lib_source_hash():
+    """Hash of the source code of all modules in lib, used as the version of lib."""
+    sha = hashlib.sha256()
+    for path in sorted(glob.glob(join(dirname(__file__), "*.py"))):
+        with open(path, "rb") as file:
+            sha.update(file.read())
+    return sha.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _protocol_source_hash(protocol):
+    """
+    Hash of the source code of a protocol class and its base classes.
+
+    Classes without source file, e.g. defined in a notebook, are hashed by the bytecode, constants and names of
+    their methods instead, which do not depend on the file or line the class is defined in.
+    """
+    sha = hashlib.sha256()
+    for cls in protocol.__mro__[:-1]:  # Skip object
+        try:
+            sha.update(inspect.getsource(cls).encode())
+        except (OSError, TypeError):
+            sha.update(cls.__qualname__.encode())
+            for name, value in sorted(vars(cls).items()):
+                function = getattr(value, "__func__", getattr(value, "fget", value))  # (static/class)method, property
+                if isinstance(getattr(function, "__code__", None), types.CodeType):
+                    sha.update(name.encode())
+                    _update_code_hash(sha, function.__code__)
+                elif isinstance(value, (bool, int, float, complex, str, bytes, type(None))):
+                    sha.update(f"{name}={value!r}".encode())
+    return sha.hexdigest()
+
+
+def _update_code_hash(sha, code):
+    sha.update(code.co_code)
+    sha.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code_hash(sha, const)
+        else:
+            sha.update(repr(const).encode())
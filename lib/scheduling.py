@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+# Number of batches per worker a batch is sized for, the batches shrink with the remaining work.
+BATCHES_PER_WORKER = 4
+
+
+class CostScheduler:
+    """
+    This class distributes calls of very different cost over a worker pool, such that all workers finish at
+    about the same time.
+
+    Calls are grouped by a cost key, e.g. the values of dim and ideal of a sweep point, and calls with the same
+    key are assumed to cost the same. The first call of every group is dispatched alone and its CPU time
+    calibrates the cost of the group, until then the other calls of the group are dispatched one at a time.
+    After that, the calls of the most expensive group are dispatched first (longest processing time first) in
+    batches that hold at most a fraction 1 / (batches_per_worker * workers) of the remaining work and of the
+    remaining calls. The batches shrink towards the end of the run, and the last ones hold single calls.
+    At most two batches per worker are in flight and an idle worker takes the next one from the queue of the
+    pool, so no worker holds a backlog while others are idle. Batches also pickle the function, e.g. a sweep
+    with its parameters, once for all of their calls.
+
+    Attributes:
+            workers : int
+                Number of workers of the pool.
+            batches_per_worker : int
+                Number of batches per worker a batch is sized for. Default is BATCHES_PER_WORKER.
+            cpu_times : list of float
+                CPU time of every call of the last run.
+            wall_time : float
+                Wall time of the last run.
+            tail_time : float
+                Load-imbalance tail of the last run: the time between the first and the last worker finishing
+                its last batch, during which part of the pool is idle. Workers that got no batch are not counted.
+    """
+
+    def __init__(self, workers, batches_per_worker=BATCHES_PER_WORKER):
+        """
+        Initialize the CostScheduler class.
+
+        Parameters:
+        ----------
+        workers : int
+            Number of workers of the pool.
+        batches_per_worker : int, optional
+            Number of batches per worker a batch is sized for. Default is BATCHES_PER_WORKER.
+        """
+        self.workers = workers
+        self.batches_per_worker = batches_per_worker
+        self.cpu_times = []
+        self.wall_time = 0.0
+        self.tail_time = 0.0
+        self._pending = {}
+        self._group_times = {}
+
+    def run(self, pool, calls, cost_keys=None, on_result=None):
+        """
+        Run calls on a pool.
+
+        Parameters:
+        ----------
+        pool : multiprocessing.pool.Pool or ThreadPool
+            Pool to run the calls on.
+        calls : list of tuple
+            Function and tuple of arguments of every call.
+        cost_keys : list, optional
+            Hashable cost key of every call. Default is the same key for all calls.
+        on_result : function, optional
+            Called with the index and the return value of every call, in the order the calls finish.
+
+        Returns:
+        -------
+        list
+            Return values of the calls, in the order of calls.
+        """
+        cost_keys = [None] * len(calls) if cost_keys is None else list(cost_keys)
+        self._start(cost_keys)
+        results = [None] * len(calls)
+        self.cpu_times = [None] * len(calls)
+
+        done = queue.Queue()
+        finish_times = {}
+        in_flight = 0
+        finished = 0
+        time_start = time.time()
+        while finished < len(calls):
+            while in_flight < 2 * self.workers:
+                batch = self._next_batch()
+                if not batch:
+                    break
+                batch = [(index, *calls[index]) for index in batch]
+                pool.apply_async(_run_batch, (batch,), callback=done.put, error_callback=done.put)
+                in_flight += 1
+
+            output = done.get()
+            if isinstance(output, BaseException):
+                raise output
+            in_flight -= 1
+            timed_results, worker, time_finish = output
+            finish_times[worker] = max(finish_times.get(worker, time_finish), time_finish)
+            for index, result, cpu_time in timed_results:
+                results[index] = result
+                self.cpu_times[index] = cpu_time
+                self._group_times[cost_keys[index]].append(cpu_time)
+                finished += 1
+                if on_result is not None:
+                    on_result(index, result)
+
+        self.wall_time = time.time() - time_start
+        self.tail_time = max(finish_times.values()) - min(finish_times.values()) if finish_times else 0.0
+        return results
+
+    def remaining_cost(self):
+        """Estimated CPU time of the calls that are not dispatched yet."""
+        costs = self._costs()
+        return sum(costs[key] * len(indices) for key, indices in self._pending.items())
+
+    def _start(self, cost_keys):
+        self._pending = {}
+        for index, key in enumerate(cost_keys):
+            self._pending.setdefault(key, deque()).append(index)
+        self._group_times = {}
+
+    def _next_batch(self):
+        keys = [key for key, indices in self._pending.items() if indices]
+        if not keys:
+            return []
+        for key in keys:
+            if key not in self._group_times:
+                # The first call of a group calibrates its cost.
+                self._group_times[key] = []
+                return [self._pending[key].popleft()]
+
+        costs = self._costs()
+        key = max(keys, key=lambda key: (costs[key], len(self._pending[key])))
+        if not self._group_times[key]:
+            # Until the calibration call of the group returns, its calls are dispatched one at a time.
+            return [self._pending[key].popleft()]
+
+        # The batch holds at most its share of the remaining work, in cost and in number of calls, such that
+        # calls that cost (almost) no CPU time are spread over the workers as well.
+        shares = self.batches_per_worker * self.workers
+        target = self.remaining_cost() / shares
+        size = -(-sum(len(self._pending[key]) for key in keys) // shares)
+        batch = [self._pending[key].popleft()]
+        while self._pending[key] and len(batch) < size and (len(batch) + 1) * costs[key] <= target:
+            batch.append(self._pending[key].popleft())
+        return batch
+
+    def _costs(self):
+        """Mean CPU time per call of every group, the highest known cost for groups without finished calls."""
+        costs = {key: sum(times) / len(times) for key, times in self._group_times.items() if times}
+        highest = max(costs.values(), default=0.0)
+        return {key: costs.get(key, highest) for key in self._pending}
+
+
+def _run_batch(batch):
+    """Run a batch of calls in a worker, returns their results and CPU times, the worker and the finish time."""
+    timed_results = []
+    for index, function, arguments in batch:
+        time_start = time.thread_time()
+        result = function(*arguments)
+        timed_results.append((index, result, time.thread_time() - time_start))
+    return timed_results, (os.getpid(), threading.get_ident()), time.time()
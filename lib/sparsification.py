@@ -0,0 +1,88 @@
+import numpy as np
+
+import lib.NQobj as nq
+
+
+class SparsificationManager:
+    """
+    This class removes small matrix elements from the density matrix after every LBB within an error budget.
+
+    Numerical residues, e.g. of expm, stay as nonzero elements as auto_tidyup is off, and slow down every later
+    sparse product. Instead of a fixed tolerance, the smallest elements are dropped as long as the sum of their
+    absolute values, which bounds the trace norm of the dropped part, fits in the allowance of the LBB. Every LBB
+    may spend half of the remaining budget, such that the accumulated error never exceeds the budget. LBBs that
+    do not increase the trace norm (unitaries, losses, projections) do not increase the error of an earlier LBB
+    either, so for a sequence of these the accumulated error bounds the error of the final state. LBB.dark_counts
+    maps dm to dc_rate a^dag dm a + (1 - dc_rate) dm, which can increase the trace norm of the error dropped
+    before it by up to a factor 1 + dc_rate (dim - 2) per mode, and the bound of the final state grows by that
+    factor. The fidelity of a heralded state changes by up to the error divided by the rate, so the budget should
+    be small compared to the rate.
+
+    Attributes:
+            budget : float
+                Maximum accumulated trace-norm error of a protocol run.
+            error : float
+                Accumulated trace-norm error bound of the current protocol run.
+            dropped_nnz : int
+                Number of dropped elements during the current protocol run.
+            kept_nnz : int
+                Number of elements kept after every LBB, summed over the LBBs of the current protocol run.
+    """
+
+    def __init__(self, budget):
+        """
+        Initialize the SparsificationManager class.
+
+        Parameters:
+        ----------
+        budget : float
+            Maximum accumulated trace-norm error of a protocol run.
+        """
+        if budget < 0:
+            raise ValueError("budget should not be negative.")
+        self.budget = budget
+        self.error = 0.0
+        self.dropped_nnz = 0
+        self.kept_nnz = 0
+
+    def reset(self):
+        """Reset the accumulated error and counts, before a new protocol run."""
+        self.error = 0.0
+        self.dropped_nnz = 0
+        self.kept_nnz = 0
+
+    @property
+    def nnz_reduction(self):
+        """Fraction of the nonzero elements after the LBBs that is dropped."""
+        total = self.dropped_nnz + self.kept_nnz
+        return self.dropped_nnz / total if total else 0.0
+
+    def apply(self, dm):
+        """
+        Drop the smallest elements of a density matrix within half of the remaining budget.
+
+        Parameters:
+        ----------
+        dm : NQobj
+            Density matrix after an LBB.
+
+        Returns:
+        -------
+        NQobj
+            Density matrix without the dropped elements.
+        """
+        magnitudes = np.sort(np.abs(dm.data.data))
+        allowance = (self.budget - self.error) / 2
+        # Drop everything below the first element that does not fit in the allowance, such that elements
+        # with the same magnitude, like the two elements of a Hermitian pair, are dropped together or not at all.
+        number = np.searchsorted(np.cumsum(magnitudes), allowance, side="right")
+        if number == 0:
+            self.kept_nnz += len(magnitudes)
+            return dm
+        threshold = magnitudes[number] if number < len(magnitudes) else np.inf
+        dm, dropped = nq.sparsify(dm, threshold)
+        kept = dm.data.nnz
+        self.error += dropped
+        self.kept_nnz += kept
+        self.dropped_nnz += len(magnitudes) - kept
+        return dm
@@ -1,26 +1,46 @@
 import numpy as np
 import qutip as qt
 
-# Define standard basis states for a two-level system
-up = qt.basis(2, 0)  # dark state
-down = qt.basis(2, 1)  # bright state
-
-# Define superposition states in the X and Y basis
-x = (up + down).unit()  # X basis state
-x_min = (up - down).unit()  # -X basis state
-y = (up + 1j * down).unit()  # Y basis state
-y_min = (up - 1j * down).unit()  # -Y basis state
-
-# Convert the defined kets to density matrices
-up_dm = qt.ket2dm(up)
-down_dm = qt.ket2dm(down)
-x_dm = qt.ket2dm(x)
-x_min_dm = qt.ket2dm(x_min)
-y_dm = qt.ket2dm(y)
-y_min_dm = qt.ket2dm(y_min)
-
-# Define the identity operator for a two-level system
-eye = qt.qeye(2)
+# The constant states are built on first access (see __getattr__), such that importing lib is fast.
+_CONSTANTS = {
+    # Define standard basis states for a two-level system
+    "up": lambda: qt.basis(2, 0),  # dark state
+    "down": lambda: qt.basis(2, 1),  # bright state
+    # Define superposition states in the X and Y basis
+    "x": lambda: (_constant("up") + _constant("down")).unit(),  # X basis state
+    "x_min": lambda: (_constant("up") - _constant("down")).unit(),  # -X basis state
+    "y": lambda: (_constant("up") + 1j * _constant("down")).unit(),  # Y basis state
+    "y_min": lambda: (_constant("up") - 1j * _constant("down")).unit(),  # -Y basis state
+    # Convert the defined kets to density matrices
+    "up_dm": lambda: qt.ket2dm(_constant("up")),
+    "down_dm": lambda: qt.ket2dm(_constant("down")),
+    "x_dm": lambda: qt.ket2dm(_constant("x")),
+    "x_min_dm": lambda: qt.ket2dm(_constant("x_min")),
+    "y_dm": lambda: qt.ket2dm(_constant("y")),
+    "y_min_dm": lambda: qt.ket2dm(_constant("y_min")),
+    # Define the identity operator for a two-level system
+    "eye": lambda: qt.qeye(2),
+}
+
+
+def __getattr__(name):
+    """Build a constant state on first access and store it in the module."""
+    if name in _CONSTANTS:
+        globals()[name] = _CONSTANTS[name]()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_CONSTANTS))
+
+
+def _constant(name):
+    """Constant state for use inside this module, where __getattr__ is not used for global names."""
+    if name in globals():
+        return globals()[name]
+    return __getattr__(name)
+
 
 # Alias for the tensor product function
 tp = qt.tensor
@@ -40,7 +60,7 @@ def alpha_ket(alpha):
     Qobj
         Resulting superposition state.
     """
-    return np.sqrt(alpha) * down + np.sqrt(1 - alpha) * up
+    return np.sqrt(alpha) * _constant("down") + np.sqrt(1 - alpha) * _constant("up")
 
 
 def alpha_dm(alpha):
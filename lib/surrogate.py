@@ -0,0 +1,278 @@
+import itertools
+
+import numpy as np
+from scipy.interpolate import RBFInterpolator, RegularGridInterpolator
+
+import lib.protocol as protocol_module
+from lib.lazy_import import lazy_import
+
+xr = lazy_import("xarray")
+
+
+class Surrogate:
+    """
+    This class answers fidelity and rate queries between the points of a sweep dataset by interpolation.
+
+    Datasets of a ProtocolSweep on a grid are interpolated multilinearly, which takes a few array operations
+    per query, such that millions of points are evaluated per second. Scattered datasets, with a single
+    dimension and the parameter values as coordinates along it, are interpolated with radial basis functions.
+    The error is estimated by the difference with an interpolation of higher (grid: cubic spline) or lower
+    (scattered: linear kernel) order, and refine runs the protocol where that estimate is too large.
+
+    Attributes:
+            dataset : xr.Dataset
+                Dataset with the interpolated variables.
+            variables : list of str
+                Names of the interpolated variables. Default is fidelity and rate.
+            parameter_names : list of str
+                Names of the parameters the variables are interpolated in.
+            protocol : subclass of Protocol or None
+                Protocol class used by refine.
+            parameters : dict
+                Parameters of the protocol that are not interpolated in. Default is the attrs of the dataset.
+            cache : ResultCache or None
+                Cache for the protocol runs of refine.
+            scattered : bool
+                True if the dataset is scattered, False if it is a grid.
+    """
+
+    def __init__(self, dataset, variables=("fidelity", "rate"), protocol=None, parameters=None, cache=None):
+        """
+        Initialize the Surrogate class.
+
+        Parameters:
+        ----------
+        dataset : xr.Dataset
+            Dataset of a ProtocolSweep, or a scattered dataset with one dimension.
+        variables : tuple of str, optional
+            Names of the variables to interpolate. Default is ("fidelity", "rate").
+        protocol : subclass of Protocol, optional
+            Protocol class, only needed for refine.
+        parameters : dict, optional
+            Parameters of the protocol that are not interpolated in. Default is the attrs of the dataset.
+        cache : ResultCache, optional
+            Cache for the protocol runs of refine.
+        """
+        self.variables = list(variables)
+        self.protocol = protocol
+        self.parameters = dict(dataset.attrs) if parameters is None else dict(parameters)
+        self.cache = cache
+
+        dataset = dataset[self.variables]
+        dims = list(dataset[self.variables[0]].dims)
+        self.scattered = len(dims) == 1 and dims[0] not in dataset.coords
+        if self.scattered:
+            self.parameter_names = [name for name in dataset.coords if dataset[name].dims == (dims[0],)]
+        else:
+            # Sweep axes with a single value can not be interpolated in and are fixed parameters.
+            for name in dims:
+                if dataset.sizes[name] == 1:
+                    self.parameters[name] = dataset[name].values[0]
+            dataset = dataset.squeeze(drop=True).sortby([name for name in dims if dataset.sizes[name] > 1])
+            self.parameter_names = list(dataset[self.variables[0]].dims)
+        self.dataset = dataset
+
+        # Normalization and radial basis interpolants of a scattered dataset, set by _fit.
+        self._lower = None
+        self._width = None
+        self._rbf = None
+        self._rbf_linear = None
+        # Axes, flattened values and cubic interpolants of a grid dataset, set by _fit.
+        self._coords = None
+        self._values = None
+        self._strides = None
+        self._cubic = None
+        # Refined axes of the grid, set by _refinement_points_grid and used by _add.
+        self._new_coords = None
+        self._fit()
+
+    def __call__(self, **values):
+        """
+        Interpolate the variables at (arrays of) parameter values, broadcast against each other.
+
+        Returns:
+        -------
+        tuple
+            Arrays with the interpolated variables, NaN outside of the grid.
+        """
+        points, shape = self._points(values)
+        if self.scattered:
+            return tuple(interpolator(self._scale(points)).reshape(shape) for interpolator in self._rbf)
+        return tuple(result.reshape(shape) for result in self._multilinear(points))
+
+    def error(self, **values):
+        """
+        Estimate the interpolation error at (arrays of) parameter values.
+
+        Returns:
+        -------
+        tuple
+            Arrays with the absolute error estimate of every variable.
+        """
+        points, shape = self._points(values)
+        if self.scattered:
+            scaled = self._scale(points)
+            return tuple(
+                np.abs(rbf(scaled) - rbf_linear(scaled)).reshape(shape)
+                for rbf, rbf_linear in zip(self._rbf, self._rbf_linear)
+            )
+        if self._cubic is None:
+            raise ValueError("The error estimate of a grid needs at least 4 points along every axis.")
+        linear = self._multilinear(points)
+        return tuple(np.abs(cubic(points) - value).reshape(shape) for cubic, value in zip(self._cubic, linear))
+
+    def refine(self, tolerance=1e-3, number_of_points=None, max_iterations=1, seed=0):
+        """
+        Run the protocol where the estimated error, relative to the range of the variable, exceeds tolerance.
+
+        On a grid, the midpoints of the cells with a too large error are added as grid lines and the protocol
+        is run on the new grid points. For scattered data, the protocol is run at the number_of_points random
+        candidates in the bounding box with the largest error.
+
+        Parameters:
+        ----------
+        tolerance : float, optional
+            Relative error tolerance. Default is 1e-3.
+        number_of_points : int, optional
+            Number of new points per iteration for scattered data. Default is the number of parameters + 1.
+        max_iterations : int, optional
+            Maximum number of refinement iterations. Default is 1.
+        seed : int, optional
+            Seed of the random candidates for scattered data. Default is 0.
+
+        Returns:
+        -------
+        int
+            Number of protocol runs.
+        """
+        if self.protocol is None:
+            raise RuntimeError("A protocol is needed to refine the surrogate.")
+        rng = np.random.default_rng(seed)
+        runs = 0
+        for _ in range(max_iterations):
+            if self.scattered:
+                points = self._refinement_points_scattered(tolerance, number_of_points, rng)
+            else:
+                points = self._refinement_points_grid(tolerance)
+            if len(points) == 0:
+                break
+            results = self._run(points)
+            self._add(points, results)
+            self._fit()
+            runs += len(points)
+        return runs
+
+    def _fit(self):
+        values = [self.dataset[variable].values for variable in self.variables]
+        if self.scattered:
+            points = np.array([self.dataset[name].values for name in self.parameter_names], dtype=float).T
+            self._lower = points.min(axis=0)
+            self._width = np.where(points.max(axis=0) > self._lower, points.max(axis=0) - self._lower, 1)
+            # Local interpolation above a few thousand points, as the global fit scales cubically.
+            neighbors = None if len(points) <= 2000 else 64
+            scaled = self._scale(points)
+            self._rbf = [RBFInterpolator(scaled, value, neighbors=neighbors) for value in values]
+            self._rbf_linear = [
+                RBFInterpolator(scaled, value, kernel="linear", neighbors=neighbors) for value in values
+            ]
+            return
+
+        self._coords = [np.asarray(self.dataset[name].values, dtype=float) for name in self.parameter_names]
+        self._values = [value.ravel() for value in values]
+        self._strides = np.cumprod([1] + [len(coord) for coord in self._coords[:0:-1]])[::-1]
+        self._cubic = None
+        if all(len(coord) >= 4 for coord in self._coords):
+            self._cubic = [
+                RegularGridInterpolator(self._coords, value, method="cubic", bounds_error=False) for value in values
+            ]
+
+    def _points(self, values):
+        missing = set(self.parameter_names) - set(values)
+        if missing:
+            raise ValueError(f"Values of {sorted(missing)} are needed.")
+        arrays = np.broadcast_arrays(*[np.asarray(values[name], dtype=float) for name in self.parameter_names])
+        return np.stack([array.ravel() for array in arrays], axis=-1), arrays[0].shape
+
+    def _scale(self, points):
+        return (points - self._lower) / self._width
+
+    def _multilinear(self, points):
+        """Multilinear interpolation on the grid, vectorized over the points."""
+        lower_indices = []
+        weights = []
+        inside = np.ones(len(points), dtype=bool)
+        for axis, coord in enumerate(self._coords):
+            x = points[:, axis]
+            index = np.clip(np.searchsorted(coord, x, side="right") - 1, 0, len(coord) - 2)
+            lower_indices.append(index)
+            weights.append((x - coord[index]) / (coord[index + 1] - coord[index]))
+            inside &= (x >= coord[0]) & (x <= coord[-1])
+
+        results = [np.zeros(len(points)) for _ in self._values]
+        for corner in itertools.product((0, 1), repeat=len(self._coords)):
+            flat_index = 0
+            weight = 1
+            for index, t, upper, stride in zip(lower_indices, weights, corner, self._strides):
+                flat_index = flat_index + (index + upper) * stride
+                weight = weight * (t if upper else 1 - t)
+            for result, value in zip(results, self._values):
+                result += weight * value[flat_index]
+        for result in results:
+            result[~inside] = np.nan
+        return results
+
+    def _relative_errors(self, points):
+        errors = self.error(**{name: points[:, axis] for axis, name in enumerate(self.parameter_names)})
+        scales = [np.ptp(self.dataset[variable].values) for variable in self.variables]
+        return np.max([error / (scale if scale > 0 else 1) for error, scale in zip(errors, scales)], axis=0)
+
+    def _refinement_points_grid(self, tolerance):
+        midpoints = [(coord[:-1] + coord[1:]) / 2 for coord in self._coords]
+        cells = np.array(list(itertools.product(*midpoints)))
+        errors = self._relative_errors(cells).reshape([len(midpoint) for midpoint in midpoints])
+
+        new_coords = []
+        for axis, (coord, midpoint) in enumerate(zip(self._coords, midpoints)):
+            other_axes = tuple(i for i in range(errors.ndim) if i != axis)
+            refine = errors.max(axis=other_axes) > tolerance
+            new_coords.append(np.union1d(coord, midpoint[refine]))
+        self._new_coords = new_coords
+
+        old = [set(coord) for coord in self._coords]
+        return [
+            point
+            for point in itertools.product(*new_coords)
+            if not all(value in old_coord for value, old_coord in zip(point, old))
+        ]
+
+    def _refinement_points_scattered(self, tolerance, number_of_points, rng):
+        if number_of_points is None:
+            number_of_points = len(self.parameter_names) + 1
+        candidates = self._lower + self._width * rng.uniform(size=(100 * number_of_points, len(self._lower)))
+        errors = self._relative_errors(candidates)
+        best = np.argsort(errors)[::-1][:number_of_points]
+        return [tuple(candidates[i]) for i in best if errors[i] > tolerance]
+
+    def _run(self, points):
+        sweep = protocol_module.ProtocolSweep(self.protocol, self.parameters, {}, cache=self.cache)
+        return sweep.starmap(sweep.update_parameters_and_run, [(self.parameter_names, *point) for point in points])
+
+    def _add(self, points, results):
+        if self.scattered:
+            dim = self.dataset[self.variables[0]].dims[0]
+            new = xr.Dataset(
+                {variable: (dim, [result[variable] for result in results]) for variable in self.variables},
+                {name: (dim, [point[axis] for point in points]) for axis, name in enumerate(self.parameter_names)},
+            )
+            self.dataset = xr.concat([self.dataset, new], dim=dim)
+            return
+
+        dataset = self.dataset.reindex(dict(zip(self.parameter_names, self._new_coords)))
+        indices = tuple(
+            np.searchsorted(coord, [point[axis] for point in points]) for axis, coord in enumerate(self._new_coords)
+        )
+        for variable in self.variables:
+            values = dataset[variable].values
+            values[indices] = [result[variable] for result in results]
+            dataset[variable] = (self.parameter_names, values)
+        self.dataset = dataset
@@ -0,0 +1,180 @@
+import numpy as np
+
+import lib.LBB as lbb
+import lib.NQobj as nq
+
+# Keyword arguments of the LBBs that name the photonic modes they act on.
+PHOTON_NAME_KWARGS = ["photon_name", "photon_early_name", "photon_late_name"]
+PHOTON_NAMES_KWARGS = ["photon_names"]
+
+
+class TruncationManager:
+    """
+    This class chooses the Fock-space truncation of every photonic mode during a protocol.
+
+    Every LBB acting on photonic modes is applied with one guard level above the levels that are in use.
+    If the LBB puts more population than the budget in the guard level, it is applied again with a larger
+    dimension (the LBBs are not all trace preserving, so the trace can not be used for this check).
+    Afterwards, the top levels of the modes that hold less population than the budget are discarded,
+    such that vacuum-dominated and heralded-only modes drop to the minimum dimension.
+    The discarded population is accumulated as an estimate of the truncation error.
+
+    The budget and the error are populations of the unnormalized density matrix, not relative to the rate. The
+    heralded states are normalized by the rate, so the fidelity and the relative rate can change by up to about
+    the error divided by the rate: on ProtocolC at dim 4 (rate 7e-5), a budget of 1e-8 gives an error of 1.7e-8
+    but changes the fidelity by 4e-5. For an accuracy eps of the fidelity, use a budget of about eps times the
+    lowest rate of interest.
+
+    Attributes:
+            budget : float
+                Maximum population that can be discarded per mode and per LBB.
+            max_dim : int
+                Maximum dimension of a photonic mode.
+            min_dim : int
+                Minimum dimension of a photonic mode. Default is 2.
+            error : float
+                Accumulated truncation error of the current protocol run: the population that is discarded.
+            saturation : float
+                Largest population in the top level of a mode at max_dim during the current protocol run.
+                If this is larger than the budget, max_dim may be too small.
+            mode_dims : dict
+                Current dimension of every photonic mode.
+    """
+
+    def __init__(self, budget, max_dim, min_dim=2):
+        """
+        Initialize the TruncationManager class.
+
+        Parameters:
+        ----------
+        budget : float
+            Maximum population that can be discarded per mode and per LBB.
+        max_dim : int
+            Maximum dimension of a photonic mode.
+        min_dim : int, optional
+            Minimum dimension of a photonic mode. Default is 2.
+        """
+        if max_dim < min_dim:
+            raise ValueError("max_dim should be at least min_dim.")
+        self.budget = budget
+        self.max_dim = max_dim
+        self.min_dim = min_dim
+        self.error = 0.0
+        self.saturation = 0.0
+        self.mode_dims = {}
+
+    def reset(self):
+        """Reset the accumulated error, before a new protocol run."""
+        self.error = 0.0
+        self.saturation = 0.0
+        self.mode_dims = {}
+
+    def apply(self, LBB, dm_in, **kwargs):
+        """
+        Apply a logical building block with an automatically chosen dimension of the photonic modes.
+
+        LBBs that do not act on photonic modes are applied unchanged.
+
+        Parameters:
+        ----------
+        LBB : function of LBB.py
+            Logical building block.
+        dm_in : NQobj
+            Input density matrix.
+        **kwargs : dict
+            Keyword arguments of the LBB, the entry dim is replaced.
+
+        Returns:
+        -------
+        NQobj
+            Output density matrix, with the dimensions of the modes the LBB acts on reduced where possible.
+        """
+        photon_names = _lbb_photon_names(kwargs)
+        if not photon_names:
+            return LBB(dm_in=dm_in, **kwargs)
+
+        dims_in = [dim for name, dim in zip(dm_in.names[0], dm_in.dims[0]) if name in photon_names]
+        dim = min(max(dims_in + [self.min_dim]) + 1, self.max_dim)
+        while True:
+            dm_resized = dm_in
+            for name in photon_names:
+                if name in dm_resized.names[0]:
+                    dm_resized = nq.resize_mode(dm_resized, name, dim)
+            dm_out = LBB(dm_in=dm_resized, **dict(kwargs, dim=dim))
+
+            populations = _populations(dm_out)
+            guard = max(
+                (_mode_populations(dm_out, populations, name)[-1] for name in photon_names if name in dm_out.names[0]),
+                default=0,
+            )
+            if guard <= self.budget or dim >= self.max_dim:
+                break
+            dim += 1
+
+        if guard > self.budget:
+            # The mode can not be enlarged beyond max_dim, so the result can not be checked against a larger one.
+            self.saturation = max(self.saturation, guard)
+
+        new_names = [name for name in dm_out.names[0] if name not in dm_in.names[0]]
+        for name in dict.fromkeys(photon_names + new_names):
+            if name in dm_out.names[0] and name not in lbb.SPIN_NAMES:
+                dm_out = self._shrink(dm_out, name)
+        return dm_out
+
+    def fit(self, Q, dm):
+        """
+        Resize the photonic modes of an operator, e.g. a herald projector, to the dimensions used in dm.
+
+        Truncation of an operator is exact for operators that are diagonal in the Fock basis, like detector
+        projectors, as dm has no population in the discarded levels.
+
+        Parameters:
+        ----------
+        Q : NQobj
+            Operator to resize.
+        dm : NQobj
+            Density matrix with the target dimensions.
+
+        Returns:
+        -------
+        NQobj
+            Operator with the same dimensions as dm for the modes they share.
+        """
+        dims = dict(zip(dm.names[0], dm.dims[0]))
+        for name, dim in zip(Q.names[0], Q.dims[0]):
+            if name in dims and dims[name] != dim:
+                Q = nq.resize_mode(Q, name, dims[name])
+        return Q
+
+    def _shrink(self, dm, name):
+        """Discard the top levels of a mode as long as their population is within the budget."""
+        populations = _mode_populations(dm, _populations(dm), name)
+        tail = np.cumsum(populations[::-1])[::-1]  # tail[k] is the population in the levels from k upward
+        dim = len(populations)
+        while dim > self.min_dim and tail[dim - 1] <= self.budget:
+            dim -= 1
+        if dim < len(populations):
+            self.error += tail[dim]
+            dm = nq.resize_mode(dm, name, dim)
+        self.mode_dims[name] = dim
+        return dm
+
+
+def _lbb_photon_names(kwargs):
+    """Names of the photonic modes an LBB acts on, taken from its keyword arguments."""
+    names = [kwargs[kwarg] for kwarg in PHOTON_NAME_KWARGS if kwarg in kwargs]
+    for kwarg in PHOTON_NAMES_KWARGS:
+        names += list(kwargs.get(kwarg, []))
+    return list(dict.fromkeys(names))
+
+
+def _populations(dm):
+    """Diagonal of a density matrix, reshaped to the dims of its modes."""
+    return np.real(dm.diag()).reshape(dm.dims[0])
+
+
+def _mode_populations(dm, populations, name):
+    """Population in every Fock level of the mode called name."""
+    axis = dm.names[0].index(name)
+    other_axes = tuple(i for i in range(populations.ndim) if i != axis)
+    return populations.sum(axis=other_axes)
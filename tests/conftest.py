@@ -0,0 +1,42 @@
+import pytest
+
+COMMON = {
+    "gamma_dephasing": 30.5e6,
+    "splitting": 1e9,
+    "DW": 0.7,
+    "QE": 0.2,
+    "link_loss": 0.99,
+    "insertion_loss": 0.5,
+    "dim": 3,
+    "dc_rate": 0,
+    "ideal": False,
+}
+
+
+@pytest.fixture
+def emission_parameters():
+    """Parameters of ProtocolA, as in the tutorial notebook."""
+    return dict(
+        COMMON,
+        f_operation=0,
+        delta=0,
+        kappa_in=240e9,
+        kappa_loss=89e9,
+        gamma=100e6,
+        g=6.81e9,
+        alpha=0.1,
+    )
+
+
+@pytest.fixture
+def projection_parameters():
+    """Parameters of ProtocolB and ProtocolC, as in the tutorial notebook."""
+    return dict(
+        COMMON,
+        f_operation=-5e9,
+        delta=20e9,
+        kappa_r=21.8e9 / 2,
+        kappa_t=21.8e9 / 2,
+        gamma=92.5e6,
+        g=8.38e9,
+    )
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import pytest
+
+import lib.batch as batch
+import lib.protocol as protocol_module
+from protocols.tutorial_protocols import ProtocolA, ProtocolC
+
+
+def test_sweep_values():
+    assert np.array_equal(batch._sweep_values([1, 2, 3]), [1, 2, 3])  # pylint: disable=protected-access
+    linspace = batch._sweep_values({"linspace": [0, 1, 5]})  # pylint: disable=protected-access
+    assert np.array_equal(linspace, np.linspace(0, 1, 5))
+    with pytest.raises(KeyError):
+        batch._sweep_values({"ones": [3]})  # pylint: disable=protected-access
+
+
+def _config(emission_parameters, projection_parameters, tmp_path):
+    return {
+        "workers": 2,
+        "backend": "thread",
+        "save_folder": str(tmp_path / "results"),
+        "sweeps": [
+            {
+                "protocol": "protocols.tutorial_protocols.ProtocolA",
+                "parameters": emission_parameters,
+                "sweep_parameters": {"alpha": {"linspace": [0.05, 0.3, 4]}},
+            },
+            {
+                "protocol": "protocols.tutorial_protocols.ProtocolC",
+                "save_name": "ProtocolC_delta",
+                "parameters": dict(projection_parameters, dim=2, alpha=0.5),
+                "sweep_parameters": {"delta": [10e9, 20e9, 30e9]},
+            },
+        ],
+    }
+
+
+def test_sweep_from_config(emission_parameters, projection_parameters, tmp_path):
+    path = tmp_path / "batch.json"
+    path.write_text(json.dumps(_config(emission_parameters, projection_parameters, tmp_path)))
+    config = batch.load_config(str(path))
+    sweep = batch.sweep_from_config(config["sweeps"][1], config["save_folder"])
+    assert sweep.protocol is ProtocolC
+    assert sweep.save_name == "ProtocolC_delta"
+    assert sweep.save_results
+    assert (tmp_path / "results").is_dir()
+    assert np.array_equal(sweep.sweep_parameters["delta"], [10e9, 20e9, 30e9])
+
+
+def test_batch_matches_single_sweeps(emission_parameters, projection_parameters, tmp_path):
+    path = tmp_path / "batch.json"
+    path.write_text(json.dumps(_config(emission_parameters, projection_parameters, tmp_path)))
+    sweeps = batch.BatchSweep.from_config(str(path))
+    assert (sweeps.workers, sweeps.backend) == (2, "thread")
+    sweeps.run()
+    assert len(list((tmp_path / "results").glob("*.hdf5"))) == 2
+    assert 0 < sweeps.parallel_efficiency
+    assert 0 < sweeps.speedup
+
+    reference = protocol_module.ProtocolSweep(
+        ProtocolA, emission_parameters, {"alpha": np.linspace(0.05, 0.3, 4)}, backend="thread"
+    )
+    reference.run()
+    assert np.array_equal(sweeps.sweeps[0].dataset.fidelity.values, reference.dataset.fidelity.values)
+    assert np.array_equal(sweeps.sweeps[0].dataset.rate.values, reference.dataset.rate.values)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        batch.BatchSweep([], backend="auto")
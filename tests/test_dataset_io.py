@@ -0,0 +1,60 @@
+import numpy as np
+import xarray as xr
+
+import lib.protocol as protocol_module
+from protocols.tutorial_protocols import ProtocolA
+
+
+def _dataset():
+    rng = np.random.default_rng(0)
+    return xr.Dataset(
+        {
+            "fidelity": (("alpha", "g"), rng.uniform(size=(50, 40))),
+            "rate": (("alpha", "g"), rng.uniform(size=(50, 40))),
+        },
+        coords={"alpha": np.linspace(0, 0.3, 50), "g": np.linspace(5e9, 8e9, 40)},
+        attrs={"dim": 3, "ideal": False},
+    )
+
+
+def test_write_and_load_round_trip(tmp_path):
+    dataset = _dataset()
+    path = str(tmp_path / "dataset.hdf5")
+    protocol_module.write_dataset(dataset, path, chunk_bytes=4096)
+    loaded = protocol_module.load_dataset(path)
+    assert np.array_equal(loaded.fidelity.values, dataset.fidelity.values)
+    assert np.array_equal(loaded.alpha.values, dataset.alpha.values)
+    assert loaded.attrs["dim"] == 3
+    # Chunks of at most chunk_bytes, along both axes.
+    chunks = loaded.fidelity.encoding["chunksizes"]
+    assert np.prod(chunks) * 8 <= 4096
+
+
+def test_open_dataset_is_lazy(tmp_path):
+    dataset = _dataset()
+    path = str(tmp_path / "dataset.hdf5")
+    protocol_module.write_dataset(dataset, path)
+    with protocol_module.open_dataset(path) as opened:
+        assert opened.fidelity.variable._in_memory is False  # pylint: disable=protected-access
+        assert np.array_equal(opened.fidelity.isel(alpha=3).values, dataset.fidelity.isel(alpha=3).values)
+
+
+def test_chunk_shape():
+    assert protocol_module._chunk_shape((10, 10), 8, 2**20) == (10, 10)  # pylint: disable=protected-access
+    assert protocol_module._chunk_shape((1000, 3), 8, 800) == (32, 3)  # pylint: disable=protected-access
+
+
+def test_saved_sweep_can_be_loaded(emission_parameters, tmp_path):
+    sweep = protocol_module.ProtocolSweep(
+        ProtocolA,
+        emission_parameters,
+        {"alpha": np.array([0.05, 0.1])},
+        save_results=True,
+        save_folder=str(tmp_path),
+        save_name="ProtocolA",
+        backend="thread",
+    )
+    sweep.run()
+    (path,) = tmp_path.glob("*.hdf5")
+    loaded = protocol_module.load_dataset(str(path))
+    assert np.array_equal(loaded.fidelity.values, sweep.dataset.fidelity.values)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import qutip as qt
+
+import lib.detectors as det
+import lib.NQobj as nq
+import lib.protocol as protocol_module
+from lib.PBB import no_vacuum_projector
+from protocols.tutorial_protocols import ProtocolB
+
+
+@pytest.mark.parametrize(
+    "detector",
+    [
+        det.ThresholdDetector(),
+        det.ThresholdDetector(efficiency=0.6, dark_count=0.01),
+        det.NumberResolvingDetector(efficiency=0.8, dark_count=0.02),
+        det.NumberResolvingDetector(efficiency=0.8, max_count=1),
+    ],
+)
+def test_povm_is_complete(detector):
+    povm = detector.povm(4)
+    assert np.all(povm >= 0)
+    assert np.allclose(povm.sum(axis=0), 1)
+
+
+def test_ideal_threshold_detector():
+    assert np.array_equal(det.ThresholdDetector().povm(3), [[1, 0, 0], [0, 1, 1]])
+
+
+def test_number_resolving_detector():
+    povm = det.NumberResolvingDetector(efficiency=0.5).povm(3)
+    assert povm.shape == (4, 3)
+    # Two photons give k counts with the binomial distribution.
+    assert np.allclose(povm[:, 2], [0.25, 0.5, 0.25, 0])
+    assert det.NumberResolvingDetector(max_count=1).povm(3).shape == (2, 3)
+
+
+def test_dark_counts_add_a_count():
+    povm = det.ThresholdDetector(dark_count=0.1).povm(2)
+    assert np.allclose(povm[:, 0], [0.9, 0.1])
+    assert np.allclose(povm[:, 1], [0, 1])
+
+
+def _vacuum_projector(name, dim):
+    return nq.NQobj(qt.fock_dm(dim, 0), names=name, kind="oper")
+
+
+@pytest.fixture
+def protocol(projection_parameters):
+    protocol = ProtocolB(dict(projection_parameters, dim=2))
+    protocol.run()
+    return protocol
+
+
+def test_click_probabilities_sum_to_the_trace(protocol):
+    statistics = protocol.compute_click_statistics()
+    assert statistics.modes == det.photonic_modes(protocol.dm)
+    assert statistics.probabilities.sum() == pytest.approx(np.real(protocol.dm.tr()), rel=1e-10)
+
+
+def test_click_statistics_match_projection(protocol):
+    statistics = protocol.compute_click_statistics()
+    dims = dict(zip(protocol.dm.names[0], protocol.dm.dims[0]))
+    projectors = [no_vacuum_projector(mode, dims[mode]) for mode in ("Ea", "La")]
+    projectors += [_vacuum_projector(mode, dims[mode]) for mode in ("Eb", "Lb")]
+    projector = nq.tensor(*projectors)
+    expected = protocol.dm.conjugate_by(projector).ptrace(["Alice", "Bob"])
+    dm = statistics.dm({"Ea": 1, "La": 1, "Eb": 0, "Lb": 0})
+    assert dm.names == expected.names
+    assert np.allclose(dm.full(), expected.full())
+
+
+def test_stored_click_statistics(projection_parameters):
+    parameters = dict(projection_parameters, dim=2)
+    sweep = protocol_module.ProtocolSweep(
+        ProtocolB, parameters, {"delta": np.array([10e9, 20e9])}, store_click_statistics=True, backend="thread"
+    )
+    sweep.run()
+    protocol = ProtocolB(parameters)
+    protocol.run()
+    expected = protocol.compute_click_statistics()
+    statistics = protocol_module.get_click_statistics(sweep.dataset, delta=20e9)
+    assert statistics.modes == expected.modes
+    assert np.allclose(statistics.dm_spin, expected.dm_spin)
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+from lib.lazy_import import lazy_import
+
+
+def test_module_is_executed_on_first_access(tmp_path, monkeypatch):
+    (tmp_path / "lazy_example.py").write_text("import sys\n\nsys.lazy_example_executed = True\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_example", raising=False)
+    monkeypatch.setattr(sys, "lazy_example_executed", False, raising=False)
+    module = lazy_import("lazy_example")
+    assert "lazy_example" in sys.modules
+    assert not sys.lazy_example_executed
+    assert module.VALUE == 42
+    assert sys.lazy_example_executed
+
+
+def test_imported_module_is_returned():
+    assert lazy_import("sys") is sys
+
+
+def test_missing_module():
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("no_such_module_for_lazy_import")
+
+
+def test_running_a_protocol_does_not_import_xarray(projection_parameters):
+    code = (
+        "import sys\n"
+        "from protocols.tutorial_protocols import ProtocolC\n"
+        f"ProtocolC({dict(projection_parameters, dim=2, alpha=0.5)!r}).run()\n"
+        "assert 'pandas' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@pytest.mark.parametrize("module", ["lib.protocol", "lib.loss_polynomial", "lib.surrogate"])
+def test_importing_lib_does_not_import_xarray(module):
+    code = f"import sys\nimport {module}\nassert 'pandas' not in sys.modules\n"
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,28 @@
+# pylint: disable=protected-access
+import pytest
+import qutip as qt
+
+import lib.LBB as lbb
+import lib.NQobj as nq
+
+
+def _operator():
+    return nq.NQobj(qt.tensor(qt.sigmax(), qt.destroy(3)), names=["spin", "R"], kind="oper")
+
+
+def test_rename_modes_shares_data():
+    Q = _operator()
+    renamed = lbb._rename_modes(Q, {"spin": "A", "R": "a"})
+    assert renamed.names == [["A", "a"], ["A", "a"]]
+    assert renamed.data is Q.data
+    assert Q.names == [["spin", "R"], ["spin", "R"]]
+
+
+def test_rename_modes_can_swap_names():
+    renamed = lbb._rename_modes(_operator(), {"spin": "R", "R": "spin"})
+    assert renamed.names == [["R", "spin"], ["R", "spin"]]
+
+
+def test_rename_modes_rejects_used_names():
+    with pytest.raises(ValueError):
+        lbb._rename_modes(_operator(), {"spin": "R"})
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from lib.loss_polynomial import LossPolynomial
+from protocols.tutorial_protocols import ProtocolB
+
+
+@pytest.fixture
+def compiled(projection_parameters):
+    polynomial = LossPolynomial(ProtocolB, dict(projection_parameters, dim=2), ["link_loss"], roots={"link_loss": 4})
+    polynomial.compile()
+    return polynomial
+
+
+def test_polynomial_matches_protocol_runs(compiled, projection_parameters):
+    for link_loss in [0.5, 0.9]:
+        fidelity, rate = compiled(link_loss=link_loss)
+        parameters = dict(projection_parameters, dim=2, link_loss=link_loss)
+        expected_fidelity, expected_rate = ProtocolB(parameters).run()
+        assert fidelity == pytest.approx(np.real(expected_fidelity), abs=1e-8)
+        assert rate == pytest.approx(np.real(expected_rate), rel=1e-8)
+
+
+def test_sweep_matches_calls(compiled):
+    link_loss = np.array([0.2, 0.6, 0.9])
+    dataset = compiled.sweep({"link_loss": link_loss})
+    fidelity, rate = compiled(link_loss=link_loss)
+    assert np.allclose(dataset.fidelity.values, fidelity)
+    assert np.allclose(dataset.rate.values, rate)
+    assert "link_loss" not in dataset.attrs
+
+
+def test_sweep_needs_compile(projection_parameters):
+    with pytest.raises(RuntimeError):
+        LossPolynomial(ProtocolB, projection_parameters, ["insertion_loss"]).sweep({"insertion_loss": [0.1]})
@@ -0,0 +1,98 @@
+import pickle
+
+import numpy as np
+import pytest
+import qutip as qt
+
+import lib.NQobj as nq
+
+
+def _random_state(names, dims, seed=0):
+    rho = qt.rand_dm(int(np.prod(dims)), density=0.5, dims=[dims, dims], seed=seed)
+    return nq.NQobj(rho, names=names, kind="state")
+
+
+def _assert_same(A, B):
+    assert A.names == B.names
+    assert A.dims == B.dims
+    assert A.kind == B.kind
+    assert np.array_equal(A.full(), B.full())
+
+
+def test_pickle_round_trip():
+    rho = _random_state(["A", "a", "b"], [2, 3, 4])
+    loaded = pickle.loads(pickle.dumps(rho))
+    _assert_same(loaded, rho)
+    assert isinstance(loaded, nq.NQobj)
+    assert loaded.isherm
+
+
+def test_pickle_of_non_square_operator():
+    Q = nq.NQobj(qt.basis(3, 1), names=["a"], kind="state")
+    _assert_same(pickle.loads(pickle.dumps(Q)), Q)
+
+
+def test_unpack_without_copy_shares_the_buffer():
+    rho = _random_state(["A", "a"], [2, 3])
+    buffer = nq._pack(rho)  # pylint: disable=protected-access
+    view = nq._unpack(buffer, copy=False)  # pylint: disable=protected-access
+    _assert_same(view, rho)
+    assert np.shares_memory(view.data.data, np.frombuffer(buffer, dtype=np.uint8))
+
+
+def test_operations_agree_with_and_without_validation(monkeypatch):
+    rho = _random_state(["A", "a"], [2, 3])
+    op = nq.NQobj(qt.destroy(3), names="a", kind="oper")
+    fast = [op * rho * op.dag(), rho + rho, rho.dag(), rho.ptrace("a")]
+    monkeypatch.setattr(nq, "DEBUG_VALIDATION", True)
+    validated = [op * rho * op.dag(), rho + rho, rho.dag(), rho.ptrace("a")]
+    for A, B in zip(fast, validated):
+        _assert_same(A, B)
+
+
+def test_trusted_result_has_its_own_names():
+    rho = _random_state(["A", "a"], [2, 3])
+    copy = rho.copy()
+    copy.rename("a", "b")
+    assert rho.names == [["A", "a"], ["A", "a"]]
+
+
+def test_conjugate_by_matches_products():
+    rho = _random_state(["A", "a"], [2, 3])
+    op = nq.NQobj(qt.tensor(qt.destroy(3), qt.create(4)), names=["a", "b"], kind="oper")
+    expected = op * rho * op.dag()
+    result = rho.conjugate_by(op)
+    assert np.allclose(result.permute(expected.names).full(), expected.full())
+
+
+def test_apply_channel_matches_weighted_sum():
+    rho = _random_state(["A", "a"], [2, 3])
+    kraus = [
+        nq.NQobj(qt.destroy(3), names="a", kind="oper"),
+        nq.NQobj(qt.sigmaz(), names="A", kind="oper"),
+        nq.NQobj(qt.qeye(2), names="b", kind="oper"),
+    ]
+    weights = [0.2, 0.5, 0]
+    expected = 0.2 * (kraus[0] * rho * kraus[0].dag()) + 0.5 * (kraus[1] * rho * kraus[1].dag())
+    result = rho.apply_channel(kraus, weights)
+    assert sorted(result.names[0]) == ["A", "a", "b"]
+    assert np.allclose(result.ptrace(["A", "a"]).permute(expected.names).full(), expected.full())
+
+
+def test_partial_trace_matches_qutip():
+    rho = _random_state(["A", "a", "b"], [2, 3, 2])
+    result = nq.partial_trace(rho, ["b", "A"])
+    assert result.names == [["b", "A"], ["b", "A"]]
+    assert np.allclose(result.full(), qt.Qobj(rho).ptrace([0, 2]).permute([1, 0]).full())
+
+
+def test_partial_trace_with_different_orders_of_rows_and_columns():
+    rho = _random_state(["A", "a", "b"], [2, 3, 2])
+    mixed = nq.NQobj(rho.permute([[0, 1, 2], [2, 0, 1]]), names=[["A", "a", "b"], ["b", "A", "a"]], kind="state")
+    assert np.allclose(nq.partial_trace(mixed, ["a", "A"]).full(), nq.partial_trace(rho, ["a", "A"]).full())
+
+
+def test_partial_trace_rejects_unknown_names():
+    rho = _random_state(["A", "a"], [2, 3])
+    with pytest.raises(ValueError):
+        nq.partial_trace(rho, ["c"])
@@ -0,0 +1,99 @@
+# pylint: disable=protected-access
+import sys
+import threading
+
+import numpy as np
+import pytest
+import qutip as qt
+
+import lib.NQobj as nq
+import lib.operator_bank as ob
+
+calls = []
+
+
+@ob.banked
+def _displacement(alpha, dim=3):
+    calls.append(alpha)
+    return nq.NQobj(qt.displace(dim, alpha), names="a", kind="oper")
+
+
+@pytest.fixture(autouse=True)
+def empty_bank():
+    ob.clear()
+    calls.clear()
+    yield
+    ob.clear()
+
+
+def test_banked_operator_is_computed_once():
+    first = _displacement(0.5)
+    second = _displacement(0.5)
+    assert calls == [0.5]
+    assert first.data is second.data
+    # Every call gets its own names, such that renaming one does not rename the banked operator.
+    first.names[0][0] = "b"
+    assert second.names == [["a"], ["a"]]
+    assert _displacement(0.5).names == [["a"], ["a"]]
+
+
+def test_unhashable_arguments_are_not_banked():
+    banked_sum = ob.banked(lambda values: nq.NQobj(qt.qeye(2) * sum(values), names="a", kind="oper"))
+    assert banked_sum([1, 2]) == banked_sum([1, 2])
+    assert not ob._operators
+
+
+def test_least_recently_used_operator_is_dropped(monkeypatch):
+    monkeypatch.setattr(ob, "MAX_OPERATORS", 2)
+    _displacement(0.1)
+    _displacement(0.2)
+    _displacement(0.1)
+    _displacement(0.3)
+    _displacement(0.1)
+    _displacement(0.2)
+    assert calls == [0.1, 0.2, 0.3, 0.2]
+
+
+def test_bank_is_thread_safe(monkeypatch):
+    monkeypatch.setattr(ob, "MAX_OPERATORS", 4)
+    errors = []
+
+    def work(offset):
+        try:
+            for i in range(200):
+                _displacement(0.01 * ((i + offset) % 10))
+        except Exception as error:  # pylint: disable=broad-except
+            errors.append(error)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(8)]
+    # Switch threads often, such that they interleave inside the bank.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert not errors
+    assert len(ob._operators) <= 4
+
+
+def test_published_operators_are_attached_without_copy():
+    expected = _displacement(0.5).full()
+    with ob.published_operators() as name:
+        ob.clear()
+        ob.attach(name)
+        Q = _displacement(0.5)
+        assert calls == [0.5]
+        assert np.array_equal(Q.full(), expected)
+        memory = ob._memories[-1]
+        assert np.shares_memory(Q.data.data, np.frombuffer(memory.buf, dtype=np.uint8))
+
+
+def test_nothing_is_published_from_an_empty_bank():
+    with ob.published_operators() as name:
+        assert name is None
+    ob.attach(None)
+    assert not ob._published
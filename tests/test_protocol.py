@@ -0,0 +1,130 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import lib.protocol as protocol_module
+from lib.result_cache import ResultCache
+from protocols.tutorial_protocols import ProtocolA, ProtocolC
+
+
+def _sweep(parameters, alpha=(0.05, 0.1, 0.2), **kwargs):
+    return protocol_module.ProtocolSweep(
+        ProtocolA, parameters, {"alpha": np.array(alpha)}, backend="thread", workers=2, **kwargs
+    )
+
+
+def test_pack_hermitian_round_trip():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(4, 4)) + 1j * rng.normal(size=(4, 4))
+    matrix = matrix + matrix.conj().T
+    packed = protocol_module.pack_hermitian(matrix)
+    assert packed.shape == (16,)
+    assert np.isrealobj(packed)
+    assert np.allclose(protocol_module.unpack_hermitian(packed), matrix)
+
+
+def test_sweep_matches_single_runs(emission_parameters):
+    sweep = _sweep(emission_parameters, store_dm_heralded=True, blas_threads=None)
+    sweep.run()
+    for alpha in [0.05, 0.2]:
+        fidelity, rate = ProtocolA(dict(emission_parameters, alpha=alpha)).run()
+        point = sweep.dataset.sel(alpha=alpha)
+        assert point.fidelity.item() == pytest.approx(float(np.real(fidelity)), abs=1e-12)
+        assert point.rate.item() == pytest.approx(float(np.real(rate)), rel=1e-12)
+    dm_heralded = protocol_module.get_dm_heralded(sweep.dataset, alpha=0.1)
+    assert len(dm_heralded) == sweep.dataset.sizes["branch"]
+
+
+def test_stored_dm_needs_a_cache_that_stores_it(emission_parameters, tmp_path):
+    with pytest.raises(ValueError):
+        _sweep(emission_parameters, store_dm_heralded=True, cache=ResultCache(str(tmp_path)))
+
+
+def test_cached_dm_heralded_is_used(emission_parameters, tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), store_dm=True)
+    first = _sweep(emission_parameters, store_dm_heralded=True, cache=cache, blas_threads=None)
+    first.run()
+    assert len(list(tmp_path.glob("*" + ResultCache.extension))) == 3
+
+    # Every lookup of the second sweep hits, so the protocol is never run.
+    monkeypatch.setattr(ProtocolA, "run", _fail)
+    second = _sweep(emission_parameters, store_dm_heralded=True, cache=cache, blas_threads=None)
+    second.run()
+    assert np.array_equal(first.dataset.dm_heralded.values, second.dataset.dm_heralded.values)
+
+
+def _fail(self):
+    raise AssertionError("The cached result should have been used.")
+
+
+@pytest.mark.parametrize("backend", ["process", "thread", "auto"])
+def test_backends_agree(emission_parameters, backend):
+    alpha = np.linspace(0.05, 0.3, 8)
+    reference = _sweep(emission_parameters, alpha=alpha, blas_threads=None)
+    reference.backend = "thread"
+    reference.run()
+    sweep = _sweep(emission_parameters, alpha=alpha, blas_threads=None)
+    sweep.backend = backend
+    sweep.run()
+    assert np.array_equal(sweep.dataset.fidelity.values, reference.dataset.fidelity.values)
+    assert sweep.sweep_backend in ("process", "thread")
+    assert 0 < sweep.parallel_efficiency
+    assert 0 < sweep.speedup
+
+
+def test_auto_backend_starts_one_process_pool(emission_parameters, monkeypatch):
+    pools = []
+    start_pool = multiprocessing.Pool
+
+    def pool(*args, **kwargs):
+        pools.append(kwargs)
+        return start_pool(*args, **kwargs)
+
+    monkeypatch.setattr(protocol_module.multi, "Pool", pool)
+    sweep = _sweep(emission_parameters, alpha=np.linspace(0.05, 0.3, 8), blas_threads=None)
+    sweep.backend = "auto"
+    sweep.run()
+    assert len(pools) == 1
+    assert pools[0]["initializer"] is protocol_module._initialize_worker  # pylint: disable=protected-access
+
+
+def test_blas_threads_without_threadpoolctl_warns(emission_parameters, monkeypatch):
+    monkeypatch.setattr(protocol_module, "threadpool_limits", None)
+    with pytest.warns(UserWarning, match="threadpoolctl"):
+        _sweep(emission_parameters, blas_threads=1)
+
+
+def test_process_map_matches_run(projection_parameters):
+    fidelity, rate = ProtocolC(dict(projection_parameters, alpha=0.5, dim=4)).run()
+    map_fidelity, map_rate = ProtocolC(dict(projection_parameters, alpha=0.5, dim=4)).run_process_map()
+    assert map_fidelity == pytest.approx(np.real(fidelity), abs=1e-7)
+    assert map_rate == pytest.approx(np.real(rate), rel=1e-7)
+
+
+def test_sweep_shares_process_map_over_initial_state(emission_parameters):
+    sweep_parameters = {"g": np.array([5e9, 7e9]), "alpha": np.array([0.05, 0.1, 0.2])}
+    reference = protocol_module.ProtocolSweep(
+        ProtocolA, emission_parameters, sweep_parameters, backend="thread", workers=2, blas_threads=None
+    )
+    reference.run()
+    shared = protocol_module.ProtocolSweep(
+        ProtocolA,
+        emission_parameters,
+        sweep_parameters,
+        initial_state_parameters=["alpha"],
+        backend="thread",
+        workers=2,
+        blas_threads=None,
+    )
+    assert len(shared.sweep_calls()[1]) == 2
+    shared.run()
+    assert shared.dataset.fidelity.dims == reference.dataset.fidelity.dims
+    assert np.allclose(shared.dataset.fidelity.values, reference.dataset.fidelity.values, atol=1e-8)
+    assert np.allclose(shared.dataset.rate.values, reference.dataset.rate.values, rtol=1e-8)
+
+
+def test_serial_time_scales_with_cpu_time():
+    # A serial call that took 2 s of wall time for 1 s of CPU time.
+    assert protocol_module._serial_time([(2.0, 1.0)], 10.0) == 20.0  # pylint: disable=protected-access
+    assert protocol_module._serial_time([(2.0, 0.0)], 10.0) == 2.0  # pylint: disable=protected-access
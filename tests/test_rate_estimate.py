@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import lib.protocol as protocol_module
+from protocols.tutorial_protocols import ProtocolA, ProtocolB
+
+
+def test_estimated_rate_of_emission(emission_parameters):
+    _, rate = ProtocolA(emission_parameters).run()
+    assert ProtocolA(emission_parameters).estimate_rate() == pytest.approx(float(np.real(rate)), rel=1e-10)
+
+
+def test_estimated_rate_of_projection(projection_parameters):
+    parameters = dict(projection_parameters, dim=2)
+    _, rate = ProtocolB(parameters).run()
+    assert ProtocolB(parameters).estimate_rate() == pytest.approx(float(np.real(rate)), rel=1e-10)
+
+
+def test_rate_threshold_prunes_points(emission_parameters):
+    alpha = np.array([0.01, 0.3])
+    rates = [float(np.real(ProtocolA(dict(emission_parameters, alpha=a)).run()[1])) for a in alpha]
+    sweep = protocol_module.ProtocolSweep(
+        ProtocolA, emission_parameters, {"alpha": alpha}, rate_threshold=np.mean(rates), backend="thread"
+    )
+    sweep.run()
+    fidelity = sweep.dataset.fidelity.values
+    assert np.isnan(fidelity[rates.index(min(rates))])
+    assert not np.isnan(fidelity[rates.index(max(rates))])
+    assert np.allclose(sweep.dataset.rate.values, rates, rtol=1e-10)
+
+
+def test_rate_threshold_with_stored_branches(emission_parameters):
+    with pytest.raises(ValueError):
+        protocol_module.ProtocolSweep(
+            ProtocolA, emission_parameters, {"alpha": np.array([0.1])}, rate_threshold=1e-3, store_dm_heralded=True
+        )
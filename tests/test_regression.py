@@ -0,0 +1,53 @@
+import subprocess
+import sys
+from os.path import basename
+
+import numpy as np
+import xarray as xr
+
+from lib import regression
+from protocols.tutorial_protocols import ProtocolA
+
+LOOSE_BUDGETS = {name: {"time": 60, "memory": 1e9} for name in regression.BUDGETS}
+
+
+def test_golden_points_include_both_ends():
+    dataset = xr.Dataset(
+        {"fidelity": (("x", "y"), np.zeros((10, 2)))}, coords={"x": np.arange(10), "y": np.arange(2)}
+    )
+    points = regression.golden_points(dataset, points_per_axis=3)
+    assert points == [{"x": x, "y": y} for x in (0, 4, 9) for y in (0, 1)]
+    assert len(regression.golden_points(dataset, points_per_axis=None)) == 20
+
+
+def test_golden_files_have_a_protocol():
+    files = regression.golden_files()
+    assert files
+    assert not any(path.endswith("_fidelity_rate.hdf5") for path in files)
+    assert any("ProtocolA" in basename(path) for path in files)
+
+
+def test_golden_dataset_agrees():
+    (path,) = [path for path in regression.golden_files() if basename(path).endswith("ProtocolA.hdf5")]
+    result = regression.check_dataset(path, points_per_axis=1, budgets=LOOSE_BUDGETS)
+    assert result["points"] == 1
+    assert result["fidelity"] <= regression.FIDELITY_TOLERANCE
+    assert result["rate"] <= regression.RATE_TOLERANCE
+    assert result["ok"]
+
+
+def test_tight_budget_fails():
+    (path,) = [path for path in regression.golden_files() if basename(path).endswith("ProtocolA.hdf5")]
+    budgets = {name: {"time": 0, "memory": 1e9} for name in regression.BUDGETS}
+    assert not regression.check_dataset(path, points_per_axis=1, budgets=budgets)["ok"]
+
+
+def test_protocols_can_be_given_as_classes():
+    protocols = {"ProtocolA": ProtocolA}
+    (path,) = regression.golden_files(protocols=protocols)
+    assert regression.check_dataset(path, points_per_axis=1, budgets=LOOSE_BUDGETS, protocols=protocols)["ok"]
+
+
+def test_lib_does_not_import_the_protocols():
+    code = "import sys\nimport lib.regression\nassert 'protocols' not in sys.modules\n"
+    subprocess.run([sys.executable, "-c", code], check=True)
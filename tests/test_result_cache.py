@@ -0,0 +1,66 @@
+import pickle
+
+import pytest
+
+from lib import result_cache
+from lib.result_cache import ResultCache
+from protocols.tutorial_protocols import ProtocolA
+
+ENTRY = {"fidelity": 0.9, "rate": 1e-3, "fidelity_branch": [0.9], "rate_branch": [1e-3], "dm_heralded": None}
+
+
+def _notebook_protocol(body):
+    """A subclass of ProtocolA defined without source file, like a class of a notebook."""
+    namespace = {}
+    exec(f"def protocol_sequence(self):\n    {body}\n", namespace)  # pylint: disable=exec-used
+    return type("NotebookProtocol", (ProtocolA,), {"protocol_sequence": namespace["protocol_sequence"]})
+
+
+def test_key_depends_on_parameters(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key(ProtocolA, {"alpha": 0.1, "dim": 3})
+    assert key == cache.key(ProtocolA, {"dim": 3, "alpha": 0.1})
+    assert key != cache.key(ProtocolA, {"alpha": 0.2, "dim": 3})
+
+
+def test_key_of_class_without_source(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    first = _notebook_protocol("return 1")
+    with pytest.raises(OSError):
+        result_cache.inspect.getsource(first)
+    key = cache.key(first, {"dim": 3})
+    assert key == cache.key(_notebook_protocol("return 1"), {"dim": 3})
+    assert key != cache.key(_notebook_protocol("return 2"), {"dim": 3})
+
+
+def test_put_and_get(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key(ProtocolA, {"dim": 3})
+    assert cache.get(key) is None
+    cache.put(key, dict(ENTRY, dm_heralded=["dm"]))
+    entry = cache.get(key)
+    assert entry["fidelity"] == ENTRY["fidelity"]
+    assert entry["dm_heralded"] is None
+    assert cache.get(key, need_dm=True) is None
+
+
+def test_failed_put_leaves_no_temporary_file(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path))
+
+    def dump(*args, **kwargs):
+        raise pickle.PicklingError("entry can not be pickled")
+
+    monkeypatch.setattr(result_cache.pickle, "dump", dump)
+    with pytest.raises(pickle.PicklingError):
+        cache.put("key", ENTRY)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_put_keeps_cache_within_max_size(tmp_path):
+    entry = dict(ENTRY, payload=bytes(1000))
+    cache = ResultCache(str(tmp_path), max_size=20_000)
+    for i in range(100):
+        cache.put(f"key{i}", entry)
+    size = sum(path.stat().st_size for path in tmp_path.iterdir())
+    assert size <= 1.1 * cache.max_size + 2_000
+    assert cache.get("key99") is not None
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import lib.protocol as protocol_module
+from protocols.tutorial_protocols import ProtocolA
+
+BOUNDS = {"alpha": (0.05, 0.3), "g": (5e9, 8e9)}
+
+
+@pytest.mark.parametrize("sampling", ["sobol", "latin_hypercube", "random"])
+def test_samples_are_within_bounds_and_seeded(sampling):
+    samples = protocol_module.sample_parameters(BOUNDS, sampling, 16, seed=1)
+    assert list(samples) == list(BOUNDS)
+    for name, (lower, upper) in BOUNDS.items():
+        assert samples[name].shape == (16,)
+        assert np.all((lower <= samples[name]) & (samples[name] <= upper))
+    again = protocol_module.sample_parameters(BOUNDS, sampling, 16, seed=1)
+    assert all(np.array_equal(samples[name], again[name]) for name in BOUNDS)
+
+
+def test_unknown_sampling():
+    with pytest.raises(ValueError):
+        protocol_module.sample_parameters(BOUNDS, "grid", 16)
+    with pytest.raises(ValueError):
+        protocol_module.sample_parameters(BOUNDS, "sobol", None)
+
+
+def test_sampling_sweep(emission_parameters):
+    sweep = protocol_module.ProtocolSweep(
+        ProtocolA, emission_parameters, BOUNDS, sampling="sobol", number_of_samples=4, seed=0, backend="thread"
+    )
+    sweep.run()
+    assert sweep.dataset.fidelity.dims == ("sample",)
+    assert sweep.dataset.sizes["sample"] == 4
+    point = sweep.dataset.isel(sample=2)
+    parameters = dict(emission_parameters, alpha=point.alpha.item(), g=point.g.item())
+    fidelity, rate = ProtocolA(parameters).run()
+    assert point.fidelity.item() == pytest.approx(float(np.real(fidelity)), abs=1e-12)
+    assert point.rate.item() == pytest.approx(float(np.real(rate)), rel=1e-12)
+
+
+@pytest.mark.parametrize("sampling", ["sobol", "latin_hypercube", "random"])
+def test_integer_parameters(sampling):
+    bounds = dict(BOUNDS, dim=(2, 4))
+    samples = protocol_module.sample_parameters(bounds, sampling, 64, seed=0, integer_parameters=["dim"])
+    assert samples["dim"].dtype.kind == "i"
+    assert set(samples["dim"]) == {2, 3, 4}
+    assert samples["alpha"].dtype.kind == "f"
+
+
+def test_sampling_sweep_with_dim(emission_parameters):
+    sweep = protocol_module.ProtocolSweep(
+        ProtocolA,
+        emission_parameters,
+        {"alpha": (0.05, 0.3), "dim": (2, 3)},
+        sampling="latin_hypercube",
+        number_of_samples=4,
+        seed=0,
+        backend="thread",
+    )
+    assert sweep.samples["dim"].dtype.kind == "i"
+    sweep.run()
+    point = sweep.dataset.isel(sample=0)
+    fidelity, _ = ProtocolA(dict(emission_parameters, alpha=point.alpha.item(), dim=point.dim.item())).run()
+    assert point.fidelity.item() == pytest.approx(float(np.real(fidelity)), abs=1e-12)
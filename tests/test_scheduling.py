@@ -0,0 +1,64 @@
+# pylint: disable=protected-access
+import time
+from multiprocessing.pool import ThreadPool
+
+from lib.scheduling import CostScheduler
+
+
+def _batch_sizes(scheduler):
+    sizes = []
+    while batch := scheduler._next_batch():
+        sizes.append(len(batch))
+    return sizes
+
+
+def test_uncalibrated_group_is_dispatched_one_call_at_a_time():
+    scheduler = CostScheduler(workers=4)
+    scheduler._start([None] * 100)
+    assert _batch_sizes(scheduler) == [1] * 100
+
+
+def test_batches_shrink_after_calibration():
+    scheduler = CostScheduler(workers=4)
+    scheduler._start([None] * 100)
+    assert scheduler._next_batch() == [0]
+    scheduler._group_times[None].append(1.0)
+    sizes = _batch_sizes(scheduler)
+    assert sum(sizes) == 99
+    assert 1 < sizes[0] <= -(-99 // 16)
+    assert sizes == sorted(sizes, reverse=True)
+    assert sizes[-1] == 1
+    assert len(sizes) >= 16
+
+
+def test_free_calls_are_spread_over_the_workers():
+    scheduler = CostScheduler(workers=4)
+    scheduler._start([None] * 100)
+    scheduler._next_batch()
+    scheduler._group_times[None].append(0.0)
+    assert max(_batch_sizes(scheduler)) <= -(-99 // 16)
+
+
+def test_expensive_group_goes_first():
+    scheduler = CostScheduler(workers=2)
+    scheduler._start(["cheap"] * 10 + ["expensive"] * 10)
+    assert scheduler._next_batch() == [0]
+    assert scheduler._next_batch() == [10]
+    scheduler._group_times["cheap"].append(1.0)
+    scheduler._group_times["expensive"].append(10.0)
+    assert scheduler._next_batch()[0] == 11
+
+
+def test_run_returns_results_in_order_on_several_workers():
+    scheduler = CostScheduler(workers=4)
+    calls = [(_slow_square, (i,)) for i in range(64)]
+    with ThreadPool(4) as pool:
+        results = scheduler.run(pool, calls)
+    assert results == [i**2 for i in range(64)]
+    assert len(scheduler.cpu_times) == 64
+    assert scheduler.wall_time < 64 * 0.005
+
+
+def _slow_square(x):
+    time.sleep(0.005)
+    return x**2
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import qutip as qt
+
+import lib.NQobj as nq
+from lib.sparsification import SparsificationManager
+from protocols.tutorial_protocols import ProtocolB
+
+
+def _noisy_state(seed=0):
+    rng = np.random.default_rng(seed)
+    rho = qt.rand_dm(12, density=0.3, dims=[[3, 4], [3, 4]], seed=seed).full()
+    noise = rng.normal(scale=1e-9, size=rho.shape)
+    return nq.NQobj(rho + noise + noise.T, dims=[[3, 4], [3, 4]], names=["a", "b"], kind="state")
+
+
+def test_sparsify_drops_small_elements():
+    Q = nq.NQobj(np.array([[1, 1e-12], [1e-12, 0.5]]), names="a", kind="state")
+    sparse, error = nq.sparsify(Q, 1e-10)
+    assert sparse.data.nnz == 2
+    assert error == pytest.approx(2e-12)
+    assert sparse.names == Q.names
+    assert nq.sparsify(Q, 1e-13) == (Q, 0.0)
+
+
+def test_error_stays_within_budget():
+    manager = SparsificationManager(1e-6)
+    for seed in range(5):
+        dm = _noisy_state(seed)
+        sparse = manager.apply(dm)
+        assert manager.error <= manager.budget
+        assert (dm - sparse).norm("tr") <= manager.error + 1e-15
+    assert manager.dropped_nnz > 0
+    assert 0 < manager.nnz_reduction < 1
+
+
+def test_hermitian_pairs_are_dropped_together():
+    dm = _noisy_state()
+    sparse = SparsificationManager(1e-7).apply(dm)
+    assert np.allclose(sparse.full(), sparse.full().conj().T)
+
+
+def test_negative_budget_is_rejected():
+    with pytest.raises(ValueError):
+        SparsificationManager(-1)
+
+
+def test_protocol_with_sparsification(projection_parameters):
+    fidelity, rate = ProtocolB(dict(projection_parameters)).run()
+    protocol = ProtocolB(dict(projection_parameters, sparsification_budget=1e-9))
+    sparse_fidelity, sparse_rate = protocol.run()
+    assert protocol.sparsification_error <= 1e-9
+    assert abs(sparse_rate - rate) <= 1e-9
+    assert abs(sparse_fidelity - fidelity) <= 1e-9 / np.real(rate)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+import lib.protocol as protocol_module
+from lib.surrogate import Surrogate
+from protocols.tutorial_protocols import ProtocolA
+
+
+def _grid_dataset():
+    x = np.linspace(0, 1, 5)
+    y = np.linspace(-1, 1, 4)
+    X, Y = np.meshgrid(x, y, indexing="ij")
+    return xr.Dataset({"fidelity": (["x", "y"], X + 2 * Y), "rate": (["x", "y"], X * Y)}, {"x": x, "y": y})
+
+
+def test_grid_interpolation_is_exact_for_multilinear_functions():
+    surrogate = Surrogate(_grid_dataset())
+    x = np.array([0.1, 0.55, 0.9])
+    y = np.array([-0.7, 0.2, 0.95])
+    fidelity, rate = surrogate(x=x, y=y)
+    assert np.allclose(fidelity, x + 2 * y)
+    assert np.allclose(rate, x * y)
+    assert np.allclose(surrogate.error(x=x, y=y), 0, atol=1e-12)
+
+
+def test_grid_interpolation_outside_is_nan():
+    fidelity, _ = Surrogate(_grid_dataset())(x=[0.5, 2.0], y=0)
+    assert not np.isnan(fidelity[0])
+    assert np.isnan(fidelity[1])
+
+
+def test_missing_parameter_is_rejected():
+    with pytest.raises(ValueError):
+        Surrogate(_grid_dataset())(x=0.5)
+
+
+def test_scattered_interpolation():
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(size=(2, 200))
+    dataset = xr.Dataset(
+        {"fidelity": ("sample", x + 2 * y), "rate": ("sample", x - y)}, {"x": ("sample", x), "y": ("sample", y)}
+    )
+    surrogate = Surrogate(dataset)
+    assert surrogate.scattered
+    fidelity, rate = surrogate(x=[0.3, 0.6], y=[0.4, 0.5])
+    assert np.allclose(fidelity, [1.1, 1.6], atol=1e-3)
+    assert np.allclose(rate, [-0.1, 0.1], atol=1e-3)
+
+
+def test_refine_runs_the_protocol_at_new_grid_points(emission_parameters):
+    alpha = np.linspace(0.05, 0.3, 4)
+    sweep = protocol_module.ProtocolSweep(ProtocolA, emission_parameters, {"alpha": alpha}, backend="thread")
+    sweep.run()
+    surrogate = Surrogate(sweep.dataset, protocol=ProtocolA)
+    assert surrogate.refine(tolerance=0) == 3
+    assert surrogate.dataset.sizes["alpha"] == 7
+    new_alpha = (alpha[0] + alpha[1]) / 2
+    fidelity, rate = ProtocolA(dict(emission_parameters, alpha=new_alpha)).run()
+    point = surrogate.dataset.sel(alpha=new_alpha)
+    assert point.fidelity.item() == pytest.approx(np.real(fidelity))
+    assert point.rate.item() == pytest.approx(np.real(rate))
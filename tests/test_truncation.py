@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import qutip as qt
+
+import lib.NQobj as nq
+from lib.truncation import TruncationManager
+from protocols.tutorial_protocols import ProtocolA, ProtocolB
+
+
+def test_resize_mode_truncates_and_pads():
+    rho = nq.NQobj(qt.tensor(qt.fock_dm(2, 1), qt.thermal_dm(4, 0.5)), names=["A", "a"], kind="state")
+    truncated = nq.resize_mode(rho, "a", 2)
+    assert truncated.dims == [[2, 2], [2, 2]]
+    kept = [0, 1, 4, 5]
+    assert np.allclose(truncated.full(), rho.full()[np.ix_(kept, kept)])
+    padded = nq.resize_mode(truncated, "a", 5)
+    assert padded.dims == [[2, 5], [2, 5]]
+    assert padded.tr() == pytest.approx(truncated.tr())
+
+
+def test_fit_resizes_shared_modes_only():
+    manager = TruncationManager(1e-6, max_dim=4)
+    dm = nq.NQobj(qt.tensor(qt.fock_dm(2, 0), qt.fock_dm(2, 0)), names=["A", "a"], kind="state")
+    projector = nq.NQobj(qt.tensor(qt.fock_dm(4, 1), qt.fock_dm(3, 1)), names=["a", "b"], kind="oper")
+    assert manager.fit(projector, dm).dims == [[2, 3], [2, 3]]
+
+
+def test_max_dim_below_min_dim_is_rejected():
+    with pytest.raises(ValueError):
+        TruncationManager(1e-6, max_dim=1)
+
+
+@pytest.mark.parametrize(
+    "protocol_class, fixture", [(ProtocolA, "emission_parameters"), (ProtocolB, "projection_parameters")]
+)
+def test_truncated_protocol_agrees_with_fixed_dimension(protocol_class, fixture, request):
+    parameters = request.getfixturevalue(fixture)
+    fidelity, rate = protocol_class(dict(parameters)).run()
+    protocol = protocol_class(dict(parameters, truncation_budget=1e-10))
+    truncated_fidelity, truncated_rate = protocol.run()
+    assert protocol.truncation_error <= 1e-8
+    assert truncated_rate == pytest.approx(np.real(rate), rel=1e-6)
+    assert truncated_fidelity == pytest.approx(np.real(fidelity), abs=1e-6)
+    assert all(dim <= parameters["dim"] for dim in protocol.truncation.mode_dims.values())